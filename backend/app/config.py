@@ -1,4 +1,5 @@
 import os
+import tempfile
 from functools import lru_cache
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
@@ -32,6 +33,69 @@ class Settings(BaseSettings):
     model_name: str = os.getenv("MODEL_NAME", "gpt-4-turbo")
     temperature: float = float(os.getenv("TEMPERATURE", "0.7"))
     max_tokens: int = int(os.getenv("MAX_TOKENS", "1000"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    # "azure", or "fake" to answer after FAKE_LLM_LATENCY_MS without calling a model (load tests)
+    llm_backend: str = os.getenv("LLM_BACKEND", "azure")
+    fake_llm_latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+    
+    # Admission control for /api/query: requests whose deadline can't be met are shed with a 503,
+    # and only retrieved chunks are returned once LLM_QUEUE_DEGRADE_DEPTH admitted queries await an answer
+    admission_control_enabled: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "True").lower() in ("true", "1", "t")
+    default_request_deadline_ms: float = float(os.getenv("DEFAULT_REQUEST_DEADLINE_MS", "0"))
+    llm_queue_degrade_depth: int = int(os.getenv("LLM_QUEUE_DEGRADE_DEPTH", "64"))
+    
+    # Conversation session settings
+    session_max_turns: int = int(os.getenv("SESSION_MAX_TURNS", "50"))
+    session_history_token_budget: int = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "2000"))
+    
+    # Re-ranking: "none", "heuristic" (lexical features) or "cross_encoder" (needs sentence-transformers)
+    reranker: str = os.getenv("RERANKER", "none")
+    reranker_model: str = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "100"))
+    rerank_budget_ms: float = float(os.getenv("RERANK_BUDGET_MS", "50"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    
+    # Hot-query analytics over the Queries log, and cache pre-warming at startup (0 queries disables it)
+    hot_query_window_days: int = int(os.getenv("HOT_QUERY_WINDOW_DAYS", "7"))
+    hot_query_scan_limit: int = int(os.getenv("HOT_QUERY_SCAN_LIMIT", "50000"))
+    prewarm_queries: int = int(os.getenv("PREWARM_QUERIES", "50"))
+    prewarm_budget_seconds: float = float(os.getenv("PREWARM_BUDGET_SECONDS", "15"))
+    
+    # Response settings
+    gzip_minimum_size: int = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+    gzip_compress_level: int = int(os.getenv("GZIP_COMPRESS_LEVEL", "5"))
+    snippet_max_chars: int = int(os.getenv("SNIPPET_MAX_CHARS", "240"))
+    
+    # Ingest settings
+    document_window_size: int = int(os.getenv("DOCUMENT_WINDOW_SIZE", "1000000"))
+    chunk_insert_batch_size: int = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "1000"))
+    
+    # Chunking strategy per document type, as "type=strategy,type=strategy", over the built-in defaults
+    chunking_strategies: str = os.getenv("CHUNKING_STRATEGIES", "")
+    chunking_default_strategy: str = os.getenv("CHUNKING_DEFAULT_STRATEGY", "recursive")
+    
+    # LLM response cache settings (the SQLite file is shared by all workers on a host)
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "rag_llm_cache.sqlite3"))
+    llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    llm_cache_max_bytes: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    llm_cache_local_max_bytes: int = int(os.getenv("LLM_CACHE_LOCAL_MAX_BYTES", str(16 * 1024 * 1024)))
+    
+    # Retrieval result cache settings
+    retrieval_cache_enabled: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    retrieval_cache_max_bytes: int = int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    retrieval_cache_ttl_seconds: int = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "60"))
+    
+    # Retrieval backend: "sqlserver" (score in Python), "sqlite_fts" (embedded FTS5 index),
+    # "memory" or "sharded" (shard servers at SHARD_URLS, comma-separated)
+    retrieval_backend: str = os.getenv("RETRIEVAL_BACKEND", "sqlserver")
+    fts_index_path: str = os.getenv("FTS_INDEX_PATH", os.path.join(tempfile.gettempdir(), "rag_fts_index.sqlite3"))
+    shard_urls: str = os.getenv("SHARD_URLS", "")
+    shard_timeout_ms: int = int(os.getenv("SHARD_TIMEOUT_MS", "500"))
+    # How often each API worker checks for shards that restarted and refills them; 0 disables
+    shard_check_interval_seconds: float = float(os.getenv("SHARD_CHECK_INTERVAL_SECONDS", "30"))
+    # Snapshot the memory backend loads at startup before replaying newer rows; empty disables
+    index_snapshot_path: str = os.getenv("INDEX_SNAPSHOT_PATH", "")
     
     # Connection string for SQL Server
     @property
@@ -1,22 +1,103 @@
 import pandas as pd
 import json
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 import re
 
-from app.models.models import Document, Chunk, QueryRequest, QueryResponse, RetrievedChunk
+from app.models.models import Document, Chunk, QueryRequest, QueryResponse, RetrievedChunk, QueryFilters
+from app.services.fingerprint import content_hash, simhash, simhash_bands, is_near_duplicate, SIMHASH_BANDS
+from app.services.retrieval_cache import get_retrieval_cache
+from app.retrieval.factory import get_retriever
+
+# Keeps IN lists well under SQL Server's 2100 parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+# SQL Server accepts at most 2100 parameters per statement and 1000 rows per VALUES list
+MAX_STATEMENT_PARAMETERS = 2000
+MAX_VALUES_ROWS = 1000
+
+CHUNK_INSERT_COLUMNS = ("document_id", "content_id", "chunk_order")
+CONTENT_INSERT_COLUMNS = (
+    "content_hash", "simhash", "simhash_band0", "simhash_band1",
+    "simhash_band2", "simhash_band3", "cluster_id", "content"
+)
+
+# Times a chunk body insert is retried after losing a race on UX_ChunkContents_Hash
+CONTENT_INSERT_ATTEMPTS = 3
+
+
+def _invalidate_retrieval_cache(document_id: int, corpus: bool = False) -> None:
+    """Invalidate cached retrieval results after a write affecting a document."""
+    retrieval_cache = get_retrieval_cache()
+    if retrieval_cache is not None:
+        retrieval_cache.invalidate_document(document_id, corpus=corpus)
+
+
+def _reindex_chunks(db: Session, document_id: int, after_chunk_id: Optional[int] = None) -> None:
+    """
+    Keep a retrieval backend's own index in sync after a write.
+    
+    Without after_chunk_id the document is removed from the index and all its
+    chunks are added again; otherwise only chunks with a higher ID are added.
+    """
+    retriever = get_retriever()
+    if not retriever.maintains_index:
+        return
+    if after_chunk_id is None:
+        retriever.remove_document(document_id)
+    retriever.add_chunks(
+        ChunkRepository.iter_index_rows(db, document_ids=[document_id], after_chunk_id=after_chunk_id)
+    )
+
+
+def _bulk_insert(
+    db: Session,
+    table: str,
+    columns: Tuple[str, ...],
+    rows: List[Dict[str, Any]],
+    output_columns: Tuple[str, ...]
+) -> List[Any]:
+    """
+    Insert rows with multi-row INSERT ... VALUES statements.
+    
+    Each statement carries as many rows as SQL Server's parameter and row
+    limits allow, so a batch costs a few round trips instead of one per row.
+    
+    Returns:
+        List[Any]: The OUTPUT rows of every statement, in no guaranteed order
+    """
+    batch_size = min(MAX_VALUES_ROWS, MAX_STATEMENT_PARAMETERS // len(columns))
+    output_clause = ", ".join(f"INSERTED.{column}" for column in output_columns)
+    
+    inserted = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        params = {}
+        values = []
+        for i, row in enumerate(batch):
+            values.append("(" + ", ".join(f":{column}_{i}" for column in columns) + ")")
+            params.update({f"{column}_{i}": row[column] for column in columns})
+        query = text(f"""
+            INSERT INTO {table} ({", ".join(columns)})
+            OUTPUT {output_clause}
+            VALUES {", ".join(values)}
+        """)
+        inserted.extend(db.execute(query, params).fetchall())
+    return inserted
 
 
 class DocumentRepository:
     """Repository for document operations."""
     
     @staticmethod
-    def get_documents(db: Session, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get all documents."""
-        query = text("""
+    def get_documents(db: Session, skip: int = 0, limit: int = 100, include_content: bool = True) -> List[Dict[str, Any]]:
+        """Get all documents, optionally without their content."""
+        content_column = "content, " if include_content else ""
+        query = text(f"""
             SELECT 
-                document_id, title, content, source, 
+                document_id, title, {content_column}source, 
                 created_at, updated_at, document_type
             FROM Documents
             ORDER BY created_at DESC
@@ -42,6 +123,92 @@ class DocumentRepository:
             return dict(result._mapping)
         return None
 
+    @staticmethod
+    def document_exists(db: Session, document_id: int) -> bool:
+        """Check whether a document exists without loading its content."""
+        query = text("""
+            SELECT 1 FROM Documents WHERE document_id = :document_id
+        """)
+        return db.execute(query, {"document_id": document_id}).first() is not None
+
+    @staticmethod
+    def get_document_type(db: Session, document_id: int) -> Optional[str]:
+        """Get the type of a document without loading its content."""
+        query = text("SELECT document_type FROM Documents WHERE document_id = :document_id")
+        return db.execute(query, {"document_id": document_id}).scalar()
+
+    @staticmethod
+    def get_document_versions(db: Session) -> Dict[int, Any]:
+        """Get the last update time of every document, keyed by document_id."""
+        query = text("SELECT document_id, updated_at FROM Documents")
+        return {row.document_id: row.updated_at for row in db.execute(query)}
+
+    @staticmethod
+    def find_in_document_content(db: Session, document_id: int, needles: List[str]) -> Optional[List[bool]]:
+        """
+        Check which strings occur in a document's content without loading it.
+        
+        Returns None if the document does not exist.
+        """
+        # Binary collation so whitespace separators are matched exactly
+        columns = []
+        params = {"document_id": document_id}
+        for i, needle in enumerate(needles):
+            columns.append(f"CHARINDEX(:needle_{i}, content COLLATE Latin1_General_BIN2) AS found_{i}")
+            params[f"needle_{i}"] = needle
+        
+        query = text(f"""
+            SELECT {", ".join(columns) if columns else "1 AS found"}
+            FROM Documents
+            WHERE document_id = :document_id
+        """)
+        result = db.execute(query, params).first()
+        if result is None:
+            return None
+        return [result[i] > 0 for i in range(len(needles))]
+
+    @staticmethod
+    def iter_document_content(db: Session, document_id: int, window_size: int = 1_000_000) -> Iterator[str]:
+        """
+        Yield a document's content in windows of about window_size characters.
+        
+        SUBSTRING counts UTF-16 code units unless the collation is supplementary
+        character aware, so a window can come back shorter than window_size in
+        Python characters. Windows are advanced by the length the server used,
+        and one that would end on a high surrogate stops a unit short instead of
+        splitting the pair.
+        """
+        query = text("""
+            SELECT
+                SUBSTRING(content, :start, w.window_length) AS content_window,
+                w.window_length,
+                DATALENGTH(SUBSTRING(content, :start, w.window_length)) / 2 AS code_units
+            FROM Documents
+            CROSS APPLY (
+                SELECT CASE
+                    WHEN :length > 1
+                        AND UNICODE(SUBSTRING(content, :start + :length - 1, 1)) BETWEEN 55296 AND 56319
+                    THEN :length - 1
+                    ELSE :length
+                END AS window_length
+            ) AS w
+            WHERE document_id = :document_id
+        """)
+        
+        start = 1
+        while True:
+            row = db.execute(
+                query,
+                {"document_id": document_id, "start": start, "length": window_size}
+            ).first()
+            if row is None or not row.content_window:
+                return
+            yield row.content_window
+            # A full window has at least window_length code units in either collation
+            if row.code_units < row.window_length:
+                return
+            start += row.window_length
+
     @staticmethod
     def create_document(db: Session, document: Document) -> Dict[str, Any]:
         """Create a new document."""
@@ -92,17 +259,33 @@ class DocumentRepository:
         result = db.execute(query, params).first()
         db.commit()
         
+        # Title and source appear in results; type and source also decide filter matches
+        filters_changed = "document_type" in params or "source" in params
+        _invalidate_retrieval_cache(document_id, corpus=filters_changed)
+        if result:
+            _reindex_chunks(db, document_id)
+        
         if result:
             return dict(result._mapping)
         return None
 
     @staticmethod
     def delete_document(db: Session, document_id: int) -> bool:
-        """Delete a document and all its chunks."""
-        # First delete all chunks for this document
+        """Delete a document, all its chunks and any chunk bodies no longer referenced."""
+        # First delete all chunks for this document, then the bodies only it used
         chunk_query = text("""
+            DECLARE @content_ids TABLE (content_id INT PRIMARY KEY);
+            
+            INSERT INTO @content_ids (content_id)
+            SELECT DISTINCT content_id FROM Chunks
+            WHERE document_id = :document_id;
+            
             DELETE FROM Chunks
-            WHERE document_id = :document_id
+            WHERE document_id = :document_id;
+            
+            DELETE cc FROM ChunkContents cc
+            JOIN @content_ids ids ON ids.content_id = cc.content_id
+            WHERE NOT EXISTS (SELECT 1 FROM Chunks c WHERE c.content_id = cc.content_id);
         """)
         db.execute(chunk_query, {"document_id": document_id})
         
@@ -115,6 +298,9 @@ class DocumentRepository:
         result = db.execute(doc_query, {"document_id": document_id}).first()
         db.commit()
         
+        _invalidate_retrieval_cache(document_id)
+        get_retriever().remove_document(document_id)
+        
         return result is not None
 
 
@@ -122,62 +308,310 @@ class ChunkRepository:
     """Repository for chunk operations."""
     
     @staticmethod
-    def get_chunks_by_document(db: Session, document_id: int) -> List[Dict[str, Any]]:
-        """Get all chunks for a document."""
-        query = text("""
-            SELECT chunk_id, document_id, content, chunk_order, created_at
-            FROM Chunks
-            WHERE document_id = :document_id
-            ORDER BY chunk_order
-        """)
+    def get_chunks_by_document(db: Session, document_id: int, include_content: bool = True) -> List[Dict[str, Any]]:
+        """Get all chunks for a document, optionally without their content."""
+        if include_content:
+            query = text("""
+                SELECT c.chunk_id, c.document_id, cc.content, c.chunk_order, c.created_at
+                FROM Chunks c
+                JOIN ChunkContents cc ON cc.content_id = c.content_id
+                WHERE c.document_id = :document_id
+                ORDER BY c.chunk_order
+            """)
+        else:
+            query = text("""
+                SELECT c.chunk_id, c.document_id, c.chunk_order, c.created_at
+                FROM Chunks c
+                WHERE c.document_id = :document_id
+                ORDER BY c.chunk_order
+            """)
         result = db.execute(query, {"document_id": document_id})
         chunks = [dict(row._mapping) for row in result]
         return chunks
 
+    @staticmethod
+    def get_chunks_by_ids(db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks with their document title and source by chunk ID."""
+        chunks = []
+        for start in range(0, len(chunk_ids), LOOKUP_BATCH_SIZE):
+            group = chunk_ids[start:start + LOOKUP_BATCH_SIZE]
+            params = {f"chunk_id_{i}": chunk_id for i, chunk_id in enumerate(group)}
+            placeholders = ", ".join(f":chunk_id_{i}" for i in range(len(group)))
+            query = text(f"""
+                SELECT
+                    c.chunk_id, c.document_id, cc.content, c.chunk_order,
+                    COALESCE(cc.cluster_id, cc.content_id) AS cluster_id,
+                    d.title as document_title, d.source as document_source
+                FROM Chunks c
+                JOIN ChunkContents cc ON cc.content_id = c.content_id
+                JOIN Documents d ON d.document_id = c.document_id
+                WHERE c.chunk_id IN ({placeholders})
+            """)
+            chunks.extend(dict(row._mapping) for row in db.execute(query, params))
+        return chunks
+
     @staticmethod
     def create_chunk(db: Session, chunk: Chunk) -> Dict[str, Any]:
         """Create a new chunk."""
+        content_id = ChunkRepository._get_or_create_contents(db, [chunk.content])[0]
+        
         query = text("""
-            INSERT INTO Chunks (document_id, content, chunk_order)
+            INSERT INTO Chunks (document_id, content_id, chunk_order)
             OUTPUT INSERTED.*
-            VALUES (:document_id, :content, :chunk_order)
+            VALUES (:document_id, :content_id, :chunk_order)
         """)
         
         result = db.execute(
             query, 
             {
                 "document_id": chunk.document_id,
-                "content": chunk.content,
+                "content_id": content_id,
                 "chunk_order": chunk.chunk_order
             }
         ).first()
         
         db.commit()
-        return dict(result._mapping)
+        _invalidate_retrieval_cache(chunk.document_id, corpus=True)
+        _reindex_chunks(db, chunk.document_id, after_chunk_id=result.chunk_id - 1)
+        return dict(result._mapping, content=chunk.content)
 
     @staticmethod
-    def create_chunks_batch(db: Session, chunks: List[Chunk]) -> int:
-        """Create multiple chunks in a batch."""
+    def create_chunks_batch(db: Session, chunks: List[Chunk]) -> List[int]:
+        """
+        Create multiple chunks with multi-row inserts.
+        
+        Args:
+            db (Session): Database session
+            chunks (List[Chunk]): The chunks to create
+            
+        Returns:
+            List[int]: The chunk_id of each chunk, in the order given
+        """
         if not chunks:
-            return 0
+            return []
+        
+        # Store each distinct body once and reference it from the chunks
+        content_ids = ChunkRepository._get_or_create_contents(db, [c.content for c in chunks])
+        
+        rows = [
+            {"document_id": c.document_id, "content_id": content_id, "chunk_order": c.chunk_order}
+            for c, content_id in zip(chunks, content_ids)
+        ]
+        inserted = _bulk_insert(db, "Chunks", CHUNK_INSERT_COLUMNS, rows, ("chunk_id",) + CHUNK_INSERT_COLUMNS)
+        
+        # OUTPUT rows come back in no guaranteed order; identical rows are interchangeable
+        chunk_ids_by_row: Dict[tuple, List[int]] = {}
+        for row in inserted:
+            chunk_ids_by_row.setdefault((row.document_id, row.content_id, row.chunk_order), []).append(row.chunk_id)
+        chunk_ids = [
+            chunk_ids_by_row[(row["document_id"], row["content_id"], row["chunk_order"])].pop()
+            for row in rows
+        ]
         
-        # Using executemany with PyODBC
-        conn = db.connection().connection
-        cursor = conn.cursor()
+        db.commit()
+        for document_id in {c.document_id for c in chunks}:
+            _invalidate_retrieval_cache(document_id, corpus=True)
+            _reindex_chunks(db, document_id, after_chunk_id=min(chunk_ids) - 1)
+        return chunk_ids
+
+    @staticmethod
+    def _get_or_create_contents(db: Session, contents: List[str]) -> List[int]:
+        """
+        Get the content_id of each chunk body, storing bodies not seen before.
         
-        sql = """
-            INSERT INTO Chunks (document_id, content, chunk_order)
-            VALUES (?, ?, ?)
+        Exact duplicates share a row in ChunkContents. New bodies that are
+        near-duplicates (by SimHash) of a stored body join its cluster, which
+        retrieval uses to collapse duplicates.
         """
+        hashes = [content_hash(content) for content in contents]
+        content_ids: Dict[bytes, int] = {}
+        
+        # Exact duplicates: look up bodies that are already stored
+        ChunkRepository._lookup_contents(db, list(dict.fromkeys(hashes)), content_ids)
+        
+        new_contents = {}
+        for h, content in zip(hashes, contents):
+            if h not in content_ids:
+                new_contents.setdefault(h, content)
+        
+        if new_contents:
+            fingerprints = {h: simhash(content) for h, content in new_contents.items()}
+            candidates = ChunkRepository._find_near_duplicate_candidates(db, list(fingerprints.values()))
+            
+            # A new body joins the cluster of the first near-duplicate found: a stored
+            # cluster_id, or the hash of an earlier new body that starts its own cluster
+            rows = {}
+            leaders = {}
+            for h, content in new_contents.items():
+                fingerprint = fingerprints[h]
+                cluster = next(
+                    (cluster for other, cluster in candidates if is_near_duplicate(fingerprint, other)),
+                    None
+                )
+                
+                row = {
+                    "content_hash": h,
+                    "simhash": fingerprint,
+                    "cluster_id": cluster if isinstance(cluster, int) else None,
+                    "content": content
+                }
+                for band, value in enumerate(simhash_bands(fingerprint)):
+                    row[f"simhash_band{band}"] = value
+                rows[h] = row
+                if isinstance(cluster, bytes):
+                    leaders[h] = cluster
+                # Later bodies in this batch may be near-duplicates of this one
+                candidates.append((fingerprint, cluster if cluster is not None else h))
+            
+            # Cluster leaders first, so the others can reference their content_id
+            first_pass = [row for h, row in rows.items() if h not in leaders]
+            ChunkRepository._insert_contents(db, first_pass, content_ids)
+            
+            second_pass = []
+            for h, leader in leaders.items():
+                second_pass.append(dict(rows[h], cluster_id=content_ids[leader]))
+            ChunkRepository._insert_contents(db, second_pass, content_ids)
+        
+        return [content_ids[h] for h in hashes]
+
+    @staticmethod
+    def _lookup_contents(db: Session, hashes: List[bytes], content_ids: Dict[bytes, int]) -> None:
+        """Add the content_id of each stored body among hashes to content_ids."""
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            group = hashes[start:start + LOOKUP_BATCH_SIZE]
+            params = {f"hash_{i}": h for i, h in enumerate(group)}
+            placeholders = ", ".join(f":hash_{i}" for i in range(len(group)))
+            query = text(f"""
+                SELECT content_id, content_hash
+                FROM ChunkContents
+                WHERE content_hash IN ({placeholders})
+            """)
+            for row in db.execute(query, params):
+                content_ids[bytes(row.content_hash)] = row.content_id
+
+    @staticmethod
+    def _insert_contents(db: Session, rows: List[Dict[str, Any]], content_ids: Dict[bytes, int]) -> None:
+        """
+        Insert chunk bodies and add their content_ids to content_ids.
         
-        data = [(c.document_id, c.content, c.chunk_order) for c in chunks]
-        cursor.executemany(sql, data)
+        A concurrent ingest can store the same body between the lookup and the
+        insert, failing the statement on UX_ChunkContents_Hash. The insert then
+        rolls back to a savepoint, the bodies stored meanwhile are read back
+        and only the rest are inserted again.
+        """
+        for attempt in range(CONTENT_INSERT_ATTEMPTS):
+            pending = [row for row in rows if row["content_hash"] not in content_ids]
+            if not pending:
+                return
+            try:
+                with db.begin_nested():
+                    inserted = _bulk_insert(
+                        db, "ChunkContents", CONTENT_INSERT_COLUMNS, pending, ("content_id", "content_hash")
+                    )
+            except IntegrityError:
+                if attempt == CONTENT_INSERT_ATTEMPTS - 1:
+                    raise
+                ChunkRepository._lookup_contents(db, [row["content_hash"] for row in pending], content_ids)
+                continue
+            for row in inserted:
+                content_ids[bytes(row.content_hash)] = row.content_id
+            return
+
+    @staticmethod
+    def _find_near_duplicate_candidates(db: Session, fingerprints: List[int]) -> List[tuple]:
+        """
+        Find stored bodies sharing a SimHash band with any of the fingerprints.
         
-        db.commit()
-        return len(chunks)
+        Returns (simhash, cluster_id) pairs; callers check the Hamming distance.
+        """
+        candidates = {}
+        for band in range(SIMHASH_BANDS):
+            values = sorted({simhash_bands(f)[band] for f in fingerprints})
+            for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+                group = values[start:start + LOOKUP_BATCH_SIZE]
+                params = {f"band_{i}": v for i, v in enumerate(group)}
+                placeholders = ", ".join(f":band_{i}" for i in range(len(group)))
+                query = text(f"""
+                    SELECT content_id, COALESCE(cluster_id, content_id) AS cluster_id, simhash
+                    FROM ChunkContents
+                    WHERE simhash_band{band} IN ({placeholders})
+                    AND simhash IS NOT NULL
+                """)
+                for row in db.execute(query, params):
+                    candidates[row.content_id] = (row.simhash, row.cluster_id)
+        
+        return list(candidates.values())
+
+    @staticmethod
+    def iter_retrieval_candidates(db: Session, filters: Optional[QueryFilters] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield retrieval candidates as rows arrive from the database.
+        
+        Closing the iterator early releases the rest of the result set.
+        """
+        filter_clause, params = ChunkRepository._build_filter_clause(filters)
+        query = text(ChunkRepository._candidates_sql(filter_clause, "1=1"))
+        result = db.execute(query, params)
+        try:
+            for row in result:
+                yield dict(row._mapping)
+        finally:
+            result.close()
+
+    @staticmethod
+    def iter_index_rows(
+        db: Session,
+        document_ids: Optional[List[int]] = None,
+        after_chunk_id: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield chunks with the document fields retrieval backends index.
+        
+        Args:
+            db (Session): Database session
+            document_ids (Optional[List[int]]): Only chunks of these documents (at most LOOKUP_BATCH_SIZE)
+            after_chunk_id (Optional[int]): Only chunks with a higher chunk_id
+            
+        Yields:
+            Dict[str, Any]: Chunk rows in chunk_id order
+        """
+        clauses = []
+        params = {}
+        if document_ids is not None:
+            params.update({f"document_id_{i}": document_id for i, document_id in enumerate(document_ids)})
+            placeholders = ", ".join(f":document_id_{i}" for i in range(len(document_ids)))
+            clauses.append(f"c.document_id IN ({placeholders})")
+        if after_chunk_id is not None:
+            clauses.append("c.chunk_id > :after_chunk_id")
+            params["after_chunk_id"] = after_chunk_id
+        where_clause = " AND ".join(clauses) if clauses else "1=1"
+        
+        query = text(f"""
+            SELECT
+                c.chunk_id, c.document_id, cc.content, c.chunk_order,
+                COALESCE(cc.cluster_id, cc.content_id) AS cluster_id,
+                d.title as document_title, d.source as document_source,
+                d.document_type, d.created_at
+            FROM Chunks c
+            JOIN ChunkContents cc ON cc.content_id = c.content_id
+            JOIN Documents d ON d.document_id = c.document_id
+            WHERE {where_clause}
+            ORDER BY c.chunk_id
+        """)
+        result = db.execute(query, params)
+        try:
+            for row in result:
+                yield dict(row._mapping)
+        finally:
+            result.close()
 
     @staticmethod
-    def retrieve_chunks_for_query(db: Session, query_text: str, max_chunks: int = 5) -> List[Dict[str, Any]]:
+    def retrieve_chunks_for_query(
+        db: Session,
+        query_text: str,
+        max_chunks: int = 5,
+        filters: Optional[QueryFilters] = None
+    ) -> List[Dict[str, Any]]:
         """
         Simple chunk retrieval based on keyword matching.
         This replaces the previous embedding-based retrieval.
@@ -187,23 +621,20 @@ class ChunkRepository:
         
         # Build a dynamic SQL query that searches for any of the keywords
         where_clauses = []
-        params = {"max_chunks": max_chunks}
+        filter_clause, params = ChunkRepository._build_filter_clause(filters)
+        params["max_chunks"] = max_chunks
         
         for i, keyword in enumerate(keywords):
             param_name = f"keyword_{i}"
-            where_clauses.append(f"c.content LIKE :{param_name}")
+            where_clauses.append(f"cc.content LIKE :{param_name}")
             params[param_name] = f"%{keyword}%"
         
         where_clause = " OR ".join(where_clauses) if where_clauses else "1=1"
         
         query = text(f"""
-            SELECT TOP :max_chunks
-                c.chunk_id, c.document_id, c.content, c.chunk_order,
-                d.title as document_title, d.source as document_source
-            FROM Chunks c
-            JOIN Documents d ON c.document_id = d.document_id
-            WHERE {where_clause}
-            ORDER BY c.chunk_id
+            SELECT TOP (:max_chunks) *
+            FROM ({ChunkRepository._candidates_sql(filter_clause, where_clause)}) candidates
+            ORDER BY chunk_id
         """)
         
         result = db.execute(query, params)
@@ -219,7 +650,65 @@ class ChunkRepository:
         # Sort by relevance score
         chunks.sort(key=lambda x: x["relevance_score"], reverse=True)
         
-        return chunks[:max_chunks]
+        # Keep only the best chunk of each near-duplicate cluster
+        seen_clusters = set()
+        collapsed = []
+        for chunk in chunks:
+            if chunk["cluster_id"] not in seen_clusters:
+                seen_clusters.add(chunk["cluster_id"])
+                collapsed.append(chunk)
+        
+        return collapsed[:max_chunks]
+
+    @staticmethod
+    def _candidates_sql(filter_clause: str, content_clause: str) -> str:
+        """
+        SQL selecting one representative chunk (the lowest chunk_id) per stored body.
+        
+        The filter clause is applied to Documents first, so the index seek on
+        the filtered columns drives the join to Chunks.
+        """
+        return f"""
+            SELECT
+                c.chunk_id, c.document_id, cc.content, c.chunk_order,
+                COALESCE(cc.cluster_id, cc.content_id) AS cluster_id,
+                d.title as document_title, d.source as document_source
+            FROM (
+                SELECT c.content_id, MIN(c.chunk_id) AS chunk_id
+                FROM Documents d
+                JOIN Chunks c ON c.document_id = d.document_id
+                WHERE {filter_clause}
+                GROUP BY c.content_id
+            ) rep
+            JOIN Chunks c ON c.chunk_id = rep.chunk_id
+            JOIN ChunkContents cc ON cc.content_id = rep.content_id
+            JOIN Documents d ON d.document_id = c.document_id
+            WHERE {content_clause}
+        """
+
+    @staticmethod
+    def _build_filter_clause(filters: Optional[QueryFilters]) -> Tuple[str, Dict[str, Any]]:
+        """Build a SQL condition on Documents (alias d) from query filters."""
+        if filters is None:
+            return "1=1", {}
+        
+        clauses = []
+        params = {}
+        
+        if filters.document_type is not None:
+            clauses.append("d.document_type = :filter_document_type")
+            params["filter_document_type"] = filters.document_type
+        if filters.source is not None:
+            clauses.append("d.source = :filter_source")
+            params["filter_source"] = filters.source
+        if filters.created_after is not None:
+            clauses.append("d.created_at >= :filter_created_after")
+            params["filter_created_after"] = filters.created_after
+        if filters.created_before is not None:
+            clauses.append("d.created_at < :filter_created_before")
+            params["filter_created_before"] = filters.created_before
+        
+        return (" AND ".join(clauses) if clauses else "1=1"), params
     
     @staticmethod
     def _extract_keywords(text: str) -> List[str]:
@@ -255,14 +744,20 @@ class ChunkRepository:
         return score
 
     @staticmethod
-    def save_query(db: Session, query_text: str, response_text: str, metadata: Dict = None) -> Dict[str, Any]:
+    def save_query(
+        db: Session,
+        query_text: str,
+        response_text: str,
+        metadata: Dict = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Save query and response to the database."""
         metadata_json = json.dumps(metadata) if metadata else None
         
         query = text("""
-            INSERT INTO Queries (query_text, response_text, metadata)
+            INSERT INTO Queries (query_text, response_text, metadata, session_id)
             OUTPUT INSERTED.*
-            VALUES (:query_text, :response_text, :metadata)
+            VALUES (:query_text, :response_text, :metadata, :session_id)
         """)
         
         result = db.execute(
@@ -270,9 +765,70 @@ class ChunkRepository:
             {
                 "query_text": query_text,
                 "response_text": response_text,
-                "metadata": metadata_json
+                "metadata": metadata_json,
+                "session_id": session_id
             }
         ).first()
         
         db.commit()
-        return dict(result._mapping)
\ No newline at end of file
+        return dict(result._mapping)
+
+    @staticmethod
+    def get_recent_queries(db: Session, window_days: int, limit: int) -> List[Dict[str, Any]]:
+        """Get the most recent answered queries of the last window_days days, newest first."""
+        query = text("""
+            SELECT TOP (:limit) query_text, metadata, session_id, created_at
+            FROM Queries
+            WHERE created_at >= DATEADD(day, -:window_days, GETDATE()) AND response_text IS NOT NULL
+            ORDER BY query_id DESC
+        """)
+        result = db.execute(query, {"window_days": window_days, "limit": limit})
+        
+        queries = []
+        for row in result:
+            logged = dict(row._mapping)
+            logged["metadata"] = json.loads(logged["metadata"]) if logged["metadata"] else {}
+            queries.append(logged)
+        return queries
+
+    @staticmethod
+    def get_session_turns(db: Session, session_id: str, limit: int = 50, align: int = 1) -> List[Dict[str, Any]]:
+        """
+        Get the most recent answered turns of a conversation session, oldest first.
+
+        Args:
+            db (Session): Database session
+            session_id (str): Conversation session ID
+            limit (int): Maximum number of turns to load
+            align (int): Skip older turns only in multiples of this many, so the
+                first loaded turn stays the same until align more turns arrive
+
+        Returns:
+            List[Dict[str, Any]]: Turns with their 1-based "turn_number" in the session
+        """
+        # Degraded queries are logged with an empty response and leave nothing to continue from
+        query = text("""
+            WITH answered AS (
+                SELECT query_id, query_text, response_text, metadata, created_at,
+                       ROW_NUMBER() OVER (ORDER BY query_id) AS turn_number,
+                       COUNT(*) OVER () AS turn_count
+                FROM Queries
+                WHERE session_id = :session_id AND response_text IS NOT NULL AND response_text <> ''
+            )
+            SELECT query_id, query_text, response_text, metadata, created_at, turn_number
+            FROM answered
+            WHERE turn_number > CASE
+                WHEN turn_count > :limit THEN (turn_count - :limit + :align - 1) / :align * :align
+                ELSE 0
+            END
+            ORDER BY query_id
+        """)
+        result = db.execute(query, {"session_id": session_id, "limit": limit, "align": max(1, align)})
+        
+        turns = []
+        for row in result:
+            turn = dict(row._mapping)
+            turn["metadata"] = json.loads(turn["metadata"]) if turn["metadata"] else None
+            turns.append(turn)
+        
+        return turns
\ No newline at end of file
@@ -1,12 +1,23 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
+import logging
+import threading
+import time
 
 from app.config import Settings, get_settings
-from app.database.connection import get_db
+from app.database.connection import get_db, SessionLocal
+from app.database.repository import ChunkRepository
+from app.retrieval.factory import get_retriever
+from app.retrieval.snapshot import rebuild_and_save, warm_start
+from app.services.chunking import load_encoding, uses_token_strategy
+from app.services.query_analytics import prewarm_caches
 from app.models.models import QueryRequest, QueryResponse, Document, Chunk
 from app.services.rag_service import RAGService
 from app.routes.api import router as api_router
+from app.routes.responses import SelectiveGZipMiddleware
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="RAG API",
@@ -23,9 +34,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses; streamed batch results are sent as soon as they are ready
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    minimum_size=get_settings().gzip_minimum_size,
+    compresslevel=get_settings().gzip_compress_level,
+    exclude_paths=["/api/query/batch"]
+)
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
+@app.on_event("startup")
+def build_retrieval_index():
+    # Backends with their own index are built from the database when empty,
+    # or loaded from a snapshot and brought up to date with newer rows
+    retriever = get_retriever()
+    if not retriever.maintains_index:
+        return
+    snapshot_path = get_settings().index_snapshot_path if retriever.supports_snapshot else ""
+    db = SessionLocal()
+    try:
+        if not snapshot_path:
+            retriever.fill(lambda: ChunkRepository.iter_index_rows(db))
+        elif retriever.is_empty() and not warm_start(db, retriever, snapshot_path):
+            # Save what was built, so the next worker to start can use it
+            try:
+                rebuild_and_save(db, retriever, snapshot_path)
+            except OSError as e:
+                logger.warning("Could not save index snapshot %s: %s", snapshot_path, e)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def watch_retrieval_index():
+    # An index held by other processes, like shard servers, can come back empty after
+    # they restart; refill it without waiting for this worker to restart
+    interval = get_retriever().index_check_interval
+    if interval:
+        threading.Thread(target=refill_index_periodically, args=(interval,), name="index-watch", daemon=True).start()
+
+def refill_index_periodically(interval: float):
+    retriever = get_retriever()
+    while True:
+        time.sleep(interval)
+        db = SessionLocal()
+        try:
+            retriever.fill(lambda: ChunkRepository.iter_index_rows(db))
+        except Exception as e:
+            logger.warning("Could not refill the retrieval index: %s", e)
+        finally:
+            db.close()
+
+@app.on_event("startup")
+def load_tokenizer():
+    # Token-based chunking needs the tokenizer, which tiktoken may have to download;
+    # load it now instead of in the first /process request, and fail to start without it
+    if uses_token_strategy():
+        load_encoding()
+
+@app.on_event("startup")
+def prewarm_from_query_log():
+    # Replay the hottest logged queries so the first requests after a deploy hit warm caches
+    if get_settings().prewarm_queries <= 0:
+        return
+    db = SessionLocal()
+    try:
+        logger.info("Pre-warmed caches from the query log: %s", prewarm_caches(db))
+    except Exception as e:
+        logger.warning("Could not pre-warm caches from the query log: %s", e)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def close_retrieval_index():
+    get_retriever().close()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to RAG API. Visit /docs for the API documentation."}
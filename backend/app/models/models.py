@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
 
@@ -29,22 +29,59 @@ class Chunk(BaseModel):
         orm_mode = True
 
 
+class QueryFilters(BaseModel):
+    """Model for document metadata filters applied before retrieval scoring."""
+    document_type: Optional[str] = Field(None, description="Only search documents of this type")
+    source: Optional[str] = Field(None, description="Only search documents from this source")
+    created_after: Optional[datetime] = Field(None, description="Only search documents created at or after this time")
+    created_before: Optional[datetime] = Field(None, description="Only search documents created before this time")
+
+    class Config:
+        frozen = True
+
+    @field_validator("created_after", "created_before")
+    @classmethod
+    def to_server_time(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Convert times with an offset to naive local time, the way the database stores created_at."""
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone().replace(tzinfo=None)
+
+
 class QueryRequest(BaseModel):
     """Model for RAG query request."""
     query: str = Field(..., description="The query text to process")
-    max_chunks: Optional[int] = Field(5, description="Maximum number of chunks to retrieve")
+    max_chunks: int = Field(5, ge=1, description="Maximum number of chunks to retrieve")
     temperature: Optional[float] = Field(0.7, description="Temperature for the LLM")
     include_sources: Optional[bool] = Field(True, description="Whether to include sources in response")
+    filters: Optional[QueryFilters] = Field(None, description="Document metadata filters to scope the query")
+    retrieval_timeout_ms: Optional[int] = Field(
+        None, ge=1, description="Generate with the best chunks found so far once retrieval takes this long"
+    )
+    session_id: Optional[str] = Field(
+        None, max_length=64, description="Conversation session to continue, from POST /api/sessions"
+    )
+    include_chunk_content: bool = Field(
+        True, description="Return whole chunks; when false, return a highlighted snippet of each instead"
+    )
+    allow_degraded: Optional[bool] = Field(
+        True, description="Under overload, accept the retrieved chunks without a generated answer instead of a 503"
+    )
 
 
 class RetrievedChunk(BaseModel):
     """Model for chunks retrieved during the RAG process."""
     chunk_id: int
     document_id: int
-    content: str
+    content: Optional[str] = None
     document_title: Optional[str] = None
     document_source: Optional[str] = None
     relevance_score: Optional[float] = None
+    rerank_score: Optional[float] = Field(None, description="Second-stage score, when the chunk was re-ranked")
+    snippet: Optional[str] = Field(None, description="Best-matching excerpt, when include_chunk_content is false")
+    highlights: Optional[List[Tuple[int, int]]] = Field(
+        None, description="Start and end offsets of the query keywords within the snippet"
+    )
 
 
 class QueryResponse(BaseModel):
@@ -56,6 +93,92 @@ class QueryResponse(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
+class ConversationTurn(BaseModel):
+    """Model for one turn of a conversation session."""
+    query_id: int
+    query: str
+    response: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class ConversationSession(BaseModel):
+    """Model for a conversation session and its turns."""
+    session_id: str
+    turns: List[ConversationTurn] = []
+
+
+class BatchQueryRequest(BaseModel):
+    """Model for a batch of RAG query requests."""
+    queries: List[QueryRequest] = Field(..., description="The query requests to process")
+    max_concurrency: Optional[int] = Field(4, ge=1, le=32, description="Maximum number of concurrent LLM calls")
+
+
+class BatchQueryResult(BaseModel):
+    """Model for a single result streamed back from a batch query."""
+    index: int
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+
+class HotChunk(BaseModel):
+    """Model for a chunk and how often logged queries retrieved it."""
+    chunk_id: int
+    hits: int
+
+
+class HotQuery(BaseModel):
+    """Model for a frequent query in the query log."""
+    query: str = Field(..., description="The most common spelling of the query")
+    normalized_query: str
+    count: int
+    share: float = Field(..., description="Fraction of the analyzed queries")
+    last_seen: Optional[datetime] = None
+    llm_cache_hit_ratio: float = Field(..., description="Fraction of its answers served from the LLM cache")
+    max_chunks: Optional[int] = None
+    filters: Optional[QueryFilters] = None
+    chunks: List[HotChunk] = []
+
+
+class HotQueryReport(BaseModel):
+    """Model for the hot-query report built from the query log."""
+    window_days: int
+    queries_analyzed: int
+    distinct_queries: int
+    hot_queries: List[HotQuery] = []
+    hot_chunks: List[HotChunk] = []
+
+
+class ShardStatisticsRequest(BaseModel):
+    """Model for a shard term statistics request."""
+    terms: List[str]
+
+
+class ShardSearchRequest(BaseModel):
+    """Model for a shard search request scored with corpus-wide statistics."""
+    queries: List[Tuple[List[str], int]] = Field(..., description="Pairs of query keywords and maximum number of chunks")
+    filters: Optional[QueryFilters] = None
+    statistics: Optional[Dict[str, Any]] = Field(None, description="Summed term statistics of all shards")
+
+
+class ShardChunksRequest(BaseModel):
+    """Model for fetching chunks from a shard by ID."""
+    chunk_ids: List[int]
+
+
+class ShardIndexRequest(BaseModel):
+    """Model for adding chunk rows to a shard's index."""
+    rows: List[Dict[str, Any]]
+    reset: bool = Field(False, description="Clear the shard before adding the rows")
+    complete: bool = Field(False, description="Last rows of a fill; the shard serves queries from now on")
+    owner: Optional[str] = Field(None, description="Coordinator holding the fill claim, whose lease is renewed")
+
+
+class ShardClaimRequest(BaseModel):
+    """Model for claiming the fill of an unfilled shard."""
+    owner: str = Field(..., description="ID of the claiming coordinator")
+    lease_seconds: float = Field(..., gt=0, description="Time after which another coordinator may take over")
+
+
 class DocumentCreate(BaseModel):
     """Model for creating a new document."""
     title: str
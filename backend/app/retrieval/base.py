@@ -0,0 +1,184 @@
+import heapq
+import re
+from array import array
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import QueryFilters
+
+# Fields every backend returns for a retrieved chunk
+CHUNK_FIELDS = (
+    "chunk_id", "document_id", "content", "chunk_order", "cluster_id",
+    "document_title", "document_source"
+)
+
+# Fields of an indexed chunk row (see ChunkRepository.iter_index_rows)
+INDEX_FIELDS = CHUNK_FIELDS + ("document_type", "created_at")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class BaseRetriever(ABC):
+    """
+    Interface of a retrieval backend.
+
+    search() receives keywords already extracted from each query and returns
+    chunk dicts with CHUNK_FIELDS plus relevance_score, best first, with at
+    most one chunk per near-duplicate cluster. Backends that store term
+    positions also return "matches", the (start, end, term) offsets of the
+    query keywords in each chunk, so snippets need no pass over the text.
+
+    Backends that keep their own index (maintains_index = True) are told about
+    chunk and document changes and can be rebuilt from the database. Those
+    with supports_snapshot = True can also start from a snapshot file (see
+    app.retrieval.snapshot). Backends whose index lives in processes that can
+    restart on their own set index_check_interval, and the API refills them
+    that often if needed.
+    """
+
+    name = "base"
+    maintains_index = False
+    supports_snapshot = False
+    index_check_interval: Optional[float] = None
+
+    @abstractmethod
+    def search(
+        self,
+        db: Session,
+        queries: List[Tuple[List[str], int]],
+        filters: Optional[QueryFilters] = None,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], bool]:
+        """
+        Retrieve the best chunks for several queries sharing the same filters.
+
+        Args:
+            db (Session): Database session
+            queries (List[Tuple[List[str], int]]): Pairs of query keywords and maximum number of chunks
+            filters (Optional[QueryFilters]): Document metadata filters applied before scoring
+            deadline (Optional[float]): time.monotonic() value after which scoring may stop early
+
+        Returns:
+            Tuple[List[List[Dict[str, Any]]], bool]: Chunks for each query and
+            whether the deadline cut retrieval short
+        """
+
+    @abstractmethod
+    def get_chunks(self, db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks with CHUNK_FIELDS by chunk ID, in no particular order."""
+
+    def add_chunks(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Index new or changed chunk rows with INDEX_FIELDS."""
+
+    def remove_document(self, document_id: int) -> None:
+        """Remove all chunks of a document from the index."""
+
+    def is_empty(self) -> bool:
+        """Whether the index has to be built before serving queries."""
+        return False
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole index with the given chunk rows."""
+
+    def fill(self, make_rows: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """
+        Build the index from make_rows() if it has to be built.
+
+        Backends shared by several API workers override this so that only one
+        of them builds it.
+
+        Returns:
+            bool: Whether this call built (part of) the index
+        """
+        if not self.is_empty():
+            return False
+        self.rebuild(make_rows())
+        return True
+
+    def close(self) -> None:
+        """Release files or connections held by the backend."""
+
+
+def calculate_keyword_score(text: str, keywords: List[str]) -> float:
+    """Calculate a relevance score based on keyword matches."""
+    text = text.lower()
+    score = 0.0
+    
+    for keyword in keywords:
+        if keyword in text:
+            # Add 1 point for each keyword found
+            score += 1.0
+            
+            # Add extra points for multiple occurrences
+            occurrences = text.count(keyword)
+            if occurrences > 1:
+                score += 0.2 * (occurrences - 1)
+    
+    return score
+
+
+def select_top(chunks: List[Dict[str, Any]], scores: List[float], max_chunks: int) -> List[Dict[str, Any]]:
+    """
+    Select the top-scoring chunks, keeping only the best chunk of each
+    near-duplicate cluster (nlargest keeps the stable order of a full sort).
+    """
+    best_in_cluster = {}
+    for j, chunk in enumerate(chunks):
+        best = best_in_cluster.get(chunk["cluster_id"])
+        if best is None or scores[j] > scores[best]:
+            best_in_cluster[chunk["cluster_id"]] = j
+    
+    top_indexes = heapq.nlargest(
+        max_chunks, sorted(best_in_cluster.values()), key=scores.__getitem__
+    )
+    top = []
+    for j in top_indexes:
+        chunk = dict({field: chunks[j][field] for field in CHUNK_FIELDS}, relevance_score=scores[j])
+        if "matches" in chunks[j]:
+            chunk["matches"] = chunks[j]["matches"]
+        top.append(chunk)
+    return top
+
+
+def iter_tokens(text: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield the (start, end, lowercase term) of every word in text."""
+    for match in WORD_PATTERN.finditer(text):
+        yield match.start(), match.end(), match.group().lower()
+
+
+def term_positions(text: str) -> Dict[str, array]:
+    """Map each term of text to its flattened (start, end) character offsets."""
+    positions: Dict[str, array] = {}
+    for start, end, term in iter_tokens(text):
+        offsets = positions.get(term)
+        if offsets is None:
+            offsets = positions[term] = array("I")
+        offsets.append(start)
+        offsets.append(end)
+    return positions
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens for the sidecar indexes."""
+    return [term for _, _, term in iter_tokens(text)]
+
+
+def matches_filters(row: Dict[str, Any], filters: Optional[QueryFilters]) -> bool:
+    """Check an indexed chunk row against query filters."""
+    if filters is None:
+        return True
+    if filters.document_type is not None and row["document_type"] != filters.document_type:
+        return False
+    if filters.source is not None and row["document_source"] != filters.source:
+        return False
+    created_at = row["created_at"]
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    if filters.created_after is not None and (created_at is None or created_at < filters.created_after):
+        return False
+    if filters.created_before is not None and (created_at is None or created_at >= filters.created_before):
+        return False
+    return True
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+from app.config import get_settings
+from app.retrieval.base import BaseRetriever
+
+
+@lru_cache()
+def get_retriever() -> BaseRetriever:
+    """
+    Get the process-wide retrieval backend chosen by RETRIEVAL_BACKEND.
+
+    Returns:
+        BaseRetriever: The configured backend.
+    """
+    settings = get_settings()
+    backend = settings.retrieval_backend.lower()
+
+    # Backends are imported here because the SQL Server one needs the
+    # repository, which in turn notifies the retriever of writes
+    if backend == "sqlserver":
+        from app.retrieval.sql_server import SqlServerRetriever
+        return SqlServerRetriever()
+    if backend == "sqlite_fts":
+        from app.retrieval.sqlite_fts import SqliteFtsRetriever
+        return SqliteFtsRetriever(settings.fts_index_path)
+    if backend == "memory":
+        from app.retrieval.memory import InMemoryRetriever
+        return InMemoryRetriever()
+    if backend == "sharded":
+        from app.retrieval.sharded import ShardedRetriever
+        shard_urls = [url.strip() for url in settings.shard_urls.split(",") if url.strip()]
+        return ShardedRetriever(
+            shard_urls,
+            timeout_ms=settings.shard_timeout_ms,
+            check_interval_seconds=settings.shard_check_interval_seconds
+        )
+
+    raise ValueError(f"Unknown retrieval backend: {settings.retrieval_backend}")
@@ -0,0 +1,258 @@
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import QueryFilters
+from app.retrieval.base import BaseRetriever, INDEX_FIELDS, select_top, term_positions
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class InMemoryRetriever(BaseRetriever):
+    """
+    Retrieval from an inverted index held in process memory, ranked by BM25.
+
+    Document type and source have their own posting lists, and creation times
+    a sorted index searched by bisection, so filters narrow the candidate set
+    before any term is scored. The character offsets of every term are kept
+    too, for snippets of the returned chunks. The index is built from the
+    database at startup and only sees writes made through this process, which
+    makes it suited to single-worker deployments, tests and benchmarks.
+    """
+
+    name = "memory"
+    maintains_index = True
+    supports_snapshot = True
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Drop everything from the index."""
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._positions: Dict[int, Dict[str, array]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._by_document: Dict[int, Set[int]] = {}
+        self._by_type: Dict[Any, Set[int]] = {}
+        self._by_source: Dict[Any, Set[int]] = {}
+        self._created: Dict[int, datetime] = {}
+        # (created_at, chunk_id) in order, rebuilt on the first date-filtered search after a write
+        self._by_created: Optional[List[Tuple[datetime, int]]] = None
+
+    def search(
+        self,
+        db: Session,
+        queries: List[Tuple[List[str], int]],
+        filters: Optional[QueryFilters] = None,
+        deadline: Optional[float] = None,
+        statistics: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], bool]:
+        """
+        Rank chunks for each query with BM25 over the inverted index.
+
+        A shard passes corpus-wide statistics (see term_statistics) so its
+        scores are comparable with those of the other shards.
+        """
+        with self._lock:
+            allowed = self._prefilter(filters)
+            return [
+                self._search_one(keywords, max_chunks, allowed, statistics)
+                for keywords, max_chunks in queries
+            ], False
+
+    def term_statistics(self, terms: Iterable[str]) -> Dict[str, Any]:
+        """
+        Get the statistics BM25 needs for some terms.
+
+        Returns:
+            Dict[str, Any]: chunk_count, total_length and the document
+            frequency of each term; statistics from several indexes add up
+        """
+        with self._lock:
+            return {
+                "chunk_count": len(self._rows),
+                "total_length": self._total_length,
+                "document_frequencies": {term: len(self._postings.get(term, ())) for term in set(terms)}
+            }
+
+    def _search_one(
+        self,
+        keywords: List[str],
+        max_chunks: int,
+        allowed: Optional[Set[int]],
+        statistics: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks for one query among the chunks the filters allow."""
+        if not keywords:
+            # Without keywords every allowed chunk scores zero, like the SQL Server backend
+            chunk_ids = sorted(allowed if allowed is not None else self._rows)
+        else:
+            if statistics is None:
+                statistics = self.term_statistics(keywords)
+            chunk_count = statistics["chunk_count"]
+            average_length = statistics["total_length"] / chunk_count if chunk_count else 0.0
+
+            scores: Dict[int, float] = {}
+            for term, query_frequency in Counter(keywords).items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                term_idf = bm25_idf(chunk_count, statistics["document_frequencies"].get(term, len(postings)))
+
+                # Walk whichever is shorter: the term's postings or the filtered chunk set
+                if allowed is not None and len(allowed) < len(postings):
+                    pairs = ((chunk_id, postings[chunk_id]) for chunk_id in allowed if chunk_id in postings)
+                else:
+                    pairs = postings.items()
+
+                for chunk_id, frequency in pairs:
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    length_norm = 1 - BM25_B + BM25_B * self._lengths[chunk_id] / (average_length or 1.0)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + query_frequency * term_idf * (
+                        frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                    )
+            chunk_ids = sorted(scores)
+
+        chunks = [self._rows[chunk_id] for chunk_id in chunk_ids]
+        chunk_scores = [scores.get(chunk_id, 0.0) for chunk_id in chunk_ids] if keywords else [0.0] * len(chunks)
+        top = select_top(chunks, chunk_scores, max_chunks)
+        for chunk in top:
+            chunk["matches"] = self._matches(chunk["chunk_id"], keywords)
+        return top
+
+    def _matches(self, chunk_id: int, keywords: List[str]) -> List[Tuple[int, int, str]]:
+        """Offsets of the keywords in a chunk, in text order, from the stored positions."""
+        positions = self._positions[chunk_id]
+        matches = []
+        for term in set(keywords):
+            offsets = positions.get(term)
+            if offsets:
+                matches.extend((offsets[i], offsets[i + 1], term) for i in range(0, len(offsets), 2))
+        matches.sort()
+        return matches
+
+    def get_chunks(self, db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks by ID from the index."""
+        with self._lock:
+            return [dict(self._rows[chunk_id]) for chunk_id in chunk_ids if chunk_id in self._rows]
+
+    def add_chunks(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Index chunk rows, replacing any already indexed under the same chunk_id."""
+        with self._lock:
+            for row in rows:
+                self._add(row)
+
+    def remove_document(self, document_id: int) -> None:
+        """Remove all chunks of a document."""
+        with self._lock:
+            for chunk_id in list(self._by_document.get(document_id, ())):
+                self._remove(chunk_id)
+
+    def is_empty(self) -> bool:
+        """Whether nothing has been indexed yet."""
+        with self._lock:
+            return not self._rows
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole index."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row)
+
+    def export_entries(self) -> List[Tuple[Dict[str, Any], Dict[str, array]]]:
+        """Every indexed row with its term positions, in chunk_id order (see app.retrieval.snapshot)."""
+        with self._lock:
+            return [(self._rows[chunk_id], self._positions[chunk_id]) for chunk_id in sorted(self._rows)]
+
+    def restore(self, entries: Iterable[Tuple[Dict[str, Any], Dict[str, array]]]) -> None:
+        """Replace the whole index with rows whose term positions are already known."""
+        with self._lock:
+            self._reset()
+            for row, positions in entries:
+                self._add(row, positions)
+
+    def _prefilter(self, filters: Optional[QueryFilters]) -> Optional[Set[int]]:
+        """Intersect the metadata posting lists; None means every chunk is allowed."""
+        if filters is None:
+            return None
+
+        sets = []
+        if filters.document_type is not None:
+            sets.append(self._by_type.get(filters.document_type, set()))
+        if filters.source is not None:
+            sets.append(self._by_source.get(filters.source, set()))
+        if filters.created_after is not None or filters.created_before is not None:
+            sets.append(self._created_between(filters.created_after, filters.created_before))
+        if not sets:
+            return None
+
+        sets.sort(key=len)
+        return set.intersection(*sets) if len(sets) > 1 else set(sets[0])
+
+    def _created_between(self, after: Optional[datetime], before: Optional[datetime]) -> Set[int]:
+        """Chunks created at or after after and before before; chunks without a creation time never match."""
+        if self._by_created is None:
+            self._by_created = sorted((created_at, chunk_id) for chunk_id, created_at in self._created.items())
+        index = self._by_created
+        start = bisect_left(index, (after,)) if after is not None else 0
+        end = bisect_left(index, (before,)) if before is not None else len(index)
+        return {chunk_id for _, chunk_id in index[start:end]}
+
+    def _add(self, row: Dict[str, Any], positions: Optional[Dict[str, array]] = None) -> None:
+        """Index one chunk row, tokenizing its content unless the positions are given."""
+        chunk_id = row["chunk_id"]
+        if chunk_id in self._rows:
+            self._remove(chunk_id)
+
+        self._rows[chunk_id] = {field: row.get(field) for field in INDEX_FIELDS}
+        if positions is None:
+            positions = term_positions(row["content"])
+        length = sum(len(offsets) for offsets in positions.values()) // 2
+        self._positions[chunk_id] = positions
+        self._lengths[chunk_id] = length
+        self._total_length += length
+
+        for term, offsets in positions.items():
+            self._postings.setdefault(term, {})[chunk_id] = len(offsets) // 2
+        self._by_document.setdefault(row["document_id"], set()).add(chunk_id)
+        self._by_type.setdefault(row.get("document_type"), set()).add(chunk_id)
+        self._by_source.setdefault(row.get("document_source"), set()).add(chunk_id)
+        created_at = row.get("created_at")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        if created_at is not None:
+            self._created[chunk_id] = created_at
+            self._by_created = None
+
+    def _remove(self, chunk_id: int) -> None:
+        """Remove one chunk."""
+        row = self._rows.pop(chunk_id)
+        for term in self._positions.pop(chunk_id):
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+        self._by_document[row["document_id"]].discard(chunk_id)
+        self._by_type[row["document_type"]].discard(chunk_id)
+        self._by_source[row["document_source"]].discard(chunk_id)
+        if self._created.pop(chunk_id, None) is not None:
+            self._by_created = None
+
+
+def bm25_idf(chunk_count: int, document_frequency: int) -> float:
+    """BM25 inverse document frequency (the always-positive Lucene variant)."""
+    return math.log(1 + (chunk_count - document_frequency + 0.5) / (document_frequency + 0.5))
@@ -0,0 +1,110 @@
+"""
+HTTP server for one shard of the chunk index.
+
+Each shard holds an in-memory BM25 index of the chunks whose document_id
+hashes to it (see app.retrieval.sharded). A coordinator fills it and keeps
+it up to date; shards never talk to the database.
+
+A shard starts unfilled and answers searches with 503 until a coordinator
+has sent its whole slice of the corpus, so a restarted shard is reported as
+missing instead of silently returning fewer chunks. Coordinators claim a
+fill first, so only one API worker fills each shard.
+
+Usage (from backend/):
+    python -m app.retrieval.shard_server --port 8101
+"""
+import argparse
+import threading
+import time
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from app.models.models import (
+    ShardChunksRequest, ShardClaimRequest, ShardIndexRequest, ShardSearchRequest, ShardStatisticsRequest
+)
+from app.retrieval.memory import InMemoryRetriever
+
+app = FastAPI(title="RAG shard", description="One shard of the chunk retrieval index")
+index = InMemoryRetriever()
+
+# Whether a fill completed since this process started, and who holds the claim on the next one
+fill_state: Dict[str, Any] = {"filled": False, "owner": None, "lease_seconds": 0.0, "lease_expires": 0.0}
+fill_lock = threading.Lock()
+
+
+def require_filled() -> None:
+    """Refuse queries until the shard holds its whole slice of the corpus."""
+    if not fill_state["filled"]:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Shard has not been filled")
+
+
+@app.get("/health")
+def health() -> Dict[str, Any]:
+    return {"status": "healthy", "empty": index.is_empty(), "filled": fill_state["filled"]}
+
+
+@app.post("/index/claim")
+def claim_fill(request: ShardClaimRequest) -> Dict[str, Any]:
+    now = time.monotonic()
+    with fill_lock:
+        granted = not fill_state["filled"] and (
+            fill_state["owner"] in (None, request.owner) or fill_state["lease_expires"] <= now
+        )
+        if granted:
+            fill_state.update(
+                owner=request.owner, lease_seconds=request.lease_seconds, lease_expires=now + request.lease_seconds
+            )
+    return {"granted": granted}
+
+
+@app.post("/statistics")
+def term_statistics(request: ShardStatisticsRequest) -> Dict[str, Any]:
+    require_filled()
+    return index.term_statistics(request.terms)
+
+
+@app.post("/search")
+def search(request: ShardSearchRequest) -> JSONResponse:
+    require_filled()
+    # Rows are already JSON-safe, so skip FastAPI's response encoding on the hot path
+    results, _ = index.search(None, request.queries, filters=request.filters, statistics=request.statistics)
+    return JSONResponse(results)
+
+
+@app.post("/chunks")
+def get_chunks(request: ShardChunksRequest) -> JSONResponse:
+    return JSONResponse(index.get_chunks(None, request.chunk_ids))
+
+
+@app.post("/index")
+def add_chunks(request: ShardIndexRequest) -> Dict[str, Any]:
+    if request.reset:
+        with fill_lock:
+            fill_state["filled"] = False
+        index.rebuild(request.rows)
+    else:
+        index.add_chunks(request.rows)
+
+    with fill_lock:
+        if request.owner is not None and request.owner == fill_state["owner"]:
+            fill_state["lease_expires"] = time.monotonic() + fill_state["lease_seconds"]
+        if request.complete:
+            fill_state.update(filled=True, owner=None)
+    return {"indexed": len(request.rows)}
+
+
+@app.delete("/index/documents/{document_id}")
+def remove_document(document_id: int) -> Dict[str, Any]:
+    index.remove_document(document_id)
+    return {"removed": document_id}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve one shard of the chunk index")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,282 @@
+import hashlib
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.models.models import QueryFilters
+from app.retrieval.base import BaseRetriever, select_top
+
+logger = logging.getLogger(__name__)
+
+# Chunk rows sent to a shard per indexing request
+INDEX_BATCH_SIZE = 1000
+
+# Scatter threads per shard, so concurrent queries do not wait on each other
+SCATTER_THREADS_PER_SHARD = 8
+
+# Index writes and rebuilds are not on the query path and may take longer
+INDEX_TIMEOUT_SECONDS = 60.0
+
+# A fill claim lapses if its coordinator sends no rows for this long, so another can take over
+FILL_LEASE_SECONDS = 300.0
+
+
+def shard_for_document(document_id: int, shard_count: int) -> int:
+    """Shard holding a document's chunks; stable across processes and restarts."""
+    digest = hashlib.blake2b(str(document_id).encode("ascii"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Coordinator for a chunk index split across shard servers by document_id.
+
+    A search is scattered in two rounds: the shards first report term
+    statistics, which are summed so every shard scores with the same
+    corpus-wide IDF and average length, then each shard returns its own top
+    chunks and the coordinator merges them. Since a chunk in the global top k
+    is also in its shard's top k, the merged result is the same as from a
+    single index.
+
+    Shards that fail or miss the shard timeout (or the query deadline) are
+    left out and the results are flagged as partial. So are shards that have
+    not been filled, e.g. after a restart, until fill() refills them.
+    """
+
+    name = "sharded"
+    maintains_index = True
+
+    def __init__(self, shard_urls: List[str], timeout_ms: int, check_interval_seconds: float = 0):
+        """Initialize clients for the shard servers."""
+        if not shard_urls:
+            raise ValueError("The sharded retrieval backend needs at least one shard URL")
+        self.shard_urls = shard_urls
+        self.timeout_seconds = timeout_ms / 1000
+        self.index_check_interval = check_interval_seconds or None
+        # Identifies this coordinator when claiming shard fills
+        self.owner = uuid.uuid4().hex
+        self._clients = [httpx.Client(base_url=url) for url in shard_urls]
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(shard_urls) * SCATTER_THREADS_PER_SHARD, thread_name_prefix="shard-scatter"
+        )
+
+    def search(
+        self,
+        db: Session,
+        queries: List[Tuple[List[str], int]],
+        filters: Optional[QueryFilters] = None,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], bool]:
+        """Scatter the queries to every shard and merge the top chunks."""
+        filters_payload = filters.model_dump(mode="json") if filters is not None else None
+        shards = list(range(len(self._clients)))
+        partial = False
+
+        # Round one: corpus-wide statistics for the query terms
+        statistics = None
+        terms = sorted({term for keywords, _ in queries for term in keywords})
+        if terms:
+            replies = self._scatter(shards, "/statistics", lambda shard: {"terms": terms}, deadline)
+            shards = [shard for shard in shards if replies[shard] is not None]
+            partial = len(shards) < len(self._clients)
+            statistics = _sum_statistics(replies[shard] for shard in shards)
+
+        # Round two: each shard's top chunks, scored with the shared statistics
+        payload = {
+            "queries": [[keywords, max_chunks] for keywords, max_chunks in queries],
+            "filters": filters_payload,
+            "statistics": statistics
+        }
+        replies = self._scatter(shards, "/search", lambda shard: payload, deadline)
+        answered = [replies[shard] for shard in shards if replies[shard] is not None]
+        partial = partial or len(answered) < len(shards)
+
+        results = []
+        for i, (_, max_chunks) in enumerate(queries):
+            merged = [chunk for reply in answered for chunk in reply[i]]
+            # Shard order is arbitrary, so break score ties by chunk_id like a single index
+            merged.sort(key=lambda chunk: chunk["chunk_id"])
+            results.append(select_top(merged, [chunk["relevance_score"] for chunk in merged], max_chunks))
+        return results, partial
+
+    def get_chunks(self, db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks by ID from whichever shards hold them."""
+        if not chunk_ids:
+            return []
+        shards = list(range(len(self._clients)))
+        replies = self._scatter(shards, "/chunks", lambda shard: {"chunk_ids": chunk_ids}, None)
+        return [chunk for reply in replies if reply is not None for chunk in reply]
+
+    def add_chunks(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Send chunk rows to the shards that own their documents."""
+        self._index(rows, reset=False)
+
+    def remove_document(self, document_id: int) -> None:
+        """Remove a document's chunks from its shard."""
+        shard = shard_for_document(document_id, len(self._clients))
+        try:
+            response = self._clients[shard].delete(f"/index/documents/{document_id}", timeout=INDEX_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Could not remove document %s from shard %s: %s", document_id, self.shard_urls[shard], e)
+
+    def is_empty(self) -> bool:
+        """Whether any shard has not been filled since it started."""
+        return bool(self._unfilled_shards())
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Replace the index on every shard."""
+        self._index(rows, reset=True)
+
+    def fill(self, make_rows: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """
+        Fill the shards that have not been filled since they started.
+
+        Each one is claimed first, so when several API workers start or notice
+        a restarted shard at once, only one of them reads the chunks for it.
+        Shards that are already filled, even with no chunks, are left alone.
+        """
+        claimed = [shard for shard in self._unfilled_shards() if self._claim(shard)]
+        if not claimed:
+            return False
+        logger.info("Filling shards %s", ", ".join(self.shard_urls[shard] for shard in claimed))
+        self._index(make_rows(), reset=True, shards=claimed)
+        return True
+
+    def close(self) -> None:
+        """Close the shard connections."""
+        self._executor.shutdown(wait=False)
+        for client in self._clients:
+            client.close()
+
+    def _scatter(
+        self,
+        shards: List[int],
+        path: str,
+        make_payload: Callable[[int], Dict[str, Any]],
+        deadline: Optional[float]
+    ) -> List[Optional[Any]]:
+        """
+        POST to several shards at once.
+
+        Returns:
+            List[Optional[Any]]: The decoded reply of each shard, indexed by
+            shard, or None for shards that failed or did not answer in time
+        """
+        timeout = self.timeout_seconds
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+
+        futures = {
+            self._executor.submit(self._post, shard, path, make_payload(shard), timeout): shard
+            for shard in shards
+        }
+        done, _ = wait(futures, timeout=timeout)
+
+        replies: List[Optional[Any]] = [None] * len(self._clients)
+        for future, shard in futures.items():
+            if future not in done:
+                logger.warning("Shard %s timed out on %s", self.shard_urls[shard], path)
+            elif future.exception() is not None:
+                logger.warning("Shard %s failed on %s: %s", self.shard_urls[shard], path, future.exception())
+            else:
+                replies[shard] = future.result()
+        return replies
+
+    def _unfilled_shards(self) -> List[int]:
+        """Shards that answer but have not been filled; unreachable shards are logged and skipped."""
+        unfilled = []
+        for shard, (url, client) in enumerate(zip(self.shard_urls, self._clients)):
+            try:
+                response = client.get("/health", timeout=self.timeout_seconds)
+                response.raise_for_status()
+                if not response.json()["filled"]:
+                    unfilled.append(shard)
+            except httpx.HTTPError as e:
+                logger.warning("Shard %s is unavailable: %s", url, e)
+        return unfilled
+
+    def _claim(self, shard: int) -> bool:
+        """Claim the fill of a shard for this coordinator."""
+        try:
+            reply = self._post(
+                shard, "/index/claim", {"owner": self.owner, "lease_seconds": FILL_LEASE_SECONDS}, INDEX_TIMEOUT_SECONDS
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Could not claim shard %s: %s", self.shard_urls[shard], e)
+            return False
+        return reply["granted"]
+
+    def _post(self, shard: int, path: str, payload: Dict[str, Any], timeout: float) -> Any:
+        """POST a JSON payload to one shard and decode the reply."""
+        response = self._clients[shard].post(path, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _index(self, rows: Iterable[Dict[str, Any]], reset: bool, shards: Optional[List[int]] = None) -> None:
+        """
+        Partition rows by shard and send them in batches.
+
+        With reset, the target shards (all by default) are cleared first and
+        marked filled after their last batch, unless a batch failed.
+        """
+        shard_count = len(self._clients)
+        targets = set(range(shard_count) if shards is None else shards)
+        pending: List[List[Dict[str, Any]]] = [[] for _ in range(shard_count)]
+        needs_reset = [reset] * shard_count
+        failed = [False] * shard_count
+
+        def flush(shard: int, complete: bool = False) -> None:
+            payload = {
+                "rows": pending[shard],
+                "reset": needs_reset[shard],
+                "complete": complete and not failed[shard],
+                "owner": self.owner
+            }
+            try:
+                response = self._clients[shard].post("/index", json=payload, timeout=INDEX_TIMEOUT_SECONDS)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                failed[shard] = True
+                logger.warning("Could not index %s chunks on shard %s: %s", len(pending[shard]), self.shard_urls[shard], e)
+            pending[shard] = []
+            needs_reset[shard] = False
+
+        for row in rows:
+            shard = shard_for_document(row["document_id"], shard_count)
+            if shard not in targets:
+                continue
+            pending[shard].append(_row_payload(row))
+            if len(pending[shard]) >= INDEX_BATCH_SIZE:
+                flush(shard)
+
+        # A rebuild clears and completes every target shard, even those that received no rows
+        for shard in targets:
+            if pending[shard] or reset:
+                flush(shard, complete=reset)
+
+
+def _row_payload(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a chunk row JSON-serializable."""
+    created_at = row.get("created_at")
+    if isinstance(created_at, datetime):
+        row = dict(row, created_at=created_at.isoformat())
+    return row
+
+
+def _sum_statistics(replies: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up the term statistics reported by several shards."""
+    statistics = {"chunk_count": 0, "total_length": 0, "document_frequencies": {}}
+    frequencies = statistics["document_frequencies"]
+    for reply in replies:
+        statistics["chunk_count"] += reply["chunk_count"]
+        statistics["total_length"] += reply["total_length"]
+        for term, frequency in reply["document_frequencies"].items():
+            frequencies[term] = frequencies.get(term, 0) + frequency
+    return statistics
@@ -0,0 +1,359 @@
+"""
+Snapshots of the in-memory retrieval index, for fast warm restarts and for
+bootstrapping new replicas without scanning every chunk body.
+
+A snapshot holds the indexed chunk rows, the vocabulary and each chunk's
+term positions (from which postings and lengths are rebuilt without
+tokenizing), the last update time of every document, and the highest
+chunk_id it contains. After loading one, a worker replays only what changed
+since: chunks with a higher chunk_id, documents updated since, and documents
+deleted since.
+
+File layout: a fixed header (magic, format version, high-water mark,
+creation time, chunk count, payload size and BLAKE2b digest of the payload)
+followed by three length-prefixed sections: metadata JSON, rows JSON and
+term positions as little-endian uint32s.
+
+Usage (from backend/):
+    python -m app.retrieval.snapshot build --output /var/lib/rag/index.snapshot
+    python -m app.retrieval.snapshot inspect /var/lib/rag/index.snapshot
+"""
+import argparse
+import hashlib
+import logging
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+
+from app.database.repository import ChunkRepository, DocumentRepository, LOOKUP_BATCH_SIZE
+from app.retrieval.base import INDEX_FIELDS
+from app.retrieval.memory import InMemoryRetriever
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGINDEX"
+
+# Bumped whenever the layout or the tokenization behind stored positions changes
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sHqdQQ32s")
+SECTION_LENGTH = struct.Struct("<Q")
+
+
+def save_snapshot(path: str, retriever: InMemoryRetriever, documents: Dict[int, Any]) -> Dict[str, Any]:
+    """
+    Write the retriever's index to a snapshot file.
+
+    The file is written next to the target and renamed over it, so workers
+    loading the previous snapshot never see a partial file.
+
+    Args:
+        path (str): Snapshot file to create or replace
+        retriever (InMemoryRetriever): The index to save
+        documents (Dict[int, Any]): Last update time of each document, read
+            before the index rows so that a concurrent update is replayed
+
+    Returns:
+        Dict[str, Any]: The snapshot header fields
+    """
+    entries = retriever.export_entries()
+    vocabulary: Dict[str, int] = {}
+    rows = []
+    positions = array("I")
+    for row, term_offsets in entries:
+        rows.append([row[field] for field in INDEX_FIELDS])
+        # Per chunk: term count, term IDs, offset counts, then all offsets
+        positions.append(len(term_offsets))
+        positions.extend(vocabulary.setdefault(term, len(vocabulary)) for term in term_offsets)
+        positions.extend(len(offsets) for offsets in term_offsets.values())
+        for offsets in term_offsets.values():
+            positions.extend(offsets)
+    if sys.byteorder == "big":
+        positions.byteswap()
+
+    metadata = {
+        "fields": list(INDEX_FIELDS),
+        "vocabulary": list(vocabulary),
+        "documents": [[document_id, _version(updated_at)] for document_id, updated_at in documents.items()]
+    }
+    sections = [orjson.dumps(metadata), orjson.dumps(rows), positions.tobytes()]
+
+    digest = hashlib.blake2b(digest_size=32)
+    payload_size = 0
+    for section in sections:
+        for part in (SECTION_LENGTH.pack(len(section)), section):
+            digest.update(part)
+            payload_size += len(part)
+
+    info = {
+        "format_version": FORMAT_VERSION,
+        "high_water_mark": entries[-1][0]["chunk_id"] if entries else 0,
+        "created_at": time.time(),
+        "chunk_count": len(rows),
+        "payload_size": payload_size
+    }
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, info["high_water_mark"], info["created_at"],
+                info["chunk_count"], payload_size, digest.digest()
+            ))
+            for section in sections:
+                f.write(SECTION_LENGTH.pack(len(section)))
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return info
+
+
+def read_header(path: str, verify: bool = True) -> Dict[str, Any]:
+    """
+    Read and check a snapshot's header without loading the index.
+
+    Raises:
+        ValueError: If the file is not a snapshot, has another format version
+            or, with verify, its payload does not match the stored digest
+    """
+    with open(path, "rb") as f:
+        info, digest = _unpack_header(f.read(HEADER.size))
+        if verify:
+            actual = hashlib.blake2b(digest_size=32)
+            remaining = info["payload_size"]
+            while remaining:
+                block = f.read(min(remaining, 1 << 20))
+                if not block:
+                    raise ValueError("Snapshot is truncated")
+                actual.update(block)
+                remaining -= len(block)
+            if actual.digest() != digest:
+                raise ValueError("Snapshot checksum does not match its contents")
+    return info
+
+
+def load_snapshot(path: str, retriever: InMemoryRetriever) -> Dict[str, Any]:
+    """
+    Replace the retriever's index with the contents of a snapshot.
+
+    Args:
+        path (str): Snapshot file
+        retriever (InMemoryRetriever): The index to fill
+
+    Returns:
+        Dict[str, Any]: The snapshot header fields, plus "documents", the
+        last update time of each document when the snapshot was taken
+
+    Raises:
+        ValueError: If the file is not a valid snapshot of this format
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    info, digest = _unpack_header(data[:HEADER.size])
+    payload = memoryview(data)[HEADER.size:]
+    if len(payload) != info["payload_size"]:
+        raise ValueError("Snapshot is truncated")
+    if hashlib.blake2b(payload, digest_size=32).digest() != digest:
+        raise ValueError("Snapshot checksum does not match its contents")
+
+    metadata_section, rows_section, positions_section = _split_sections(payload, 3)
+    metadata = orjson.loads(metadata_section)
+    if metadata["fields"] != list(INDEX_FIELDS):
+        raise ValueError("Snapshot was written with different index fields")
+
+    positions = array("I")
+    positions.frombytes(positions_section)
+    if sys.byteorder == "big":
+        positions.byteswap()
+
+    retriever.restore(_iter_entries(orjson.loads(rows_section), metadata["vocabulary"], positions))
+    info["documents"] = {document_id: version for document_id, version in metadata["documents"]}
+    return info
+
+
+def replay_changes(db: Session, retriever: InMemoryRetriever, info: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Bring an index loaded from a snapshot up to date with the database.
+
+    Args:
+        db (Session): Database session
+        retriever (InMemoryRetriever): Index filled by load_snapshot
+        info (Dict[str, Any]): What load_snapshot returned
+
+    Returns:
+        Dict[str, int]: Numbers of documents removed and re-indexed, and of new chunks added
+    """
+    current = DocumentRepository.get_document_versions(db)
+    stored = info["documents"]
+
+    removed = [document_id for document_id in stored if document_id not in current]
+    for document_id in removed:
+        retriever.remove_document(document_id)
+
+    changed = [
+        document_id for document_id, updated_at in current.items()
+        if document_id in stored and _version(updated_at) != stored[document_id]
+    ]
+    for start in range(0, len(changed), LOOKUP_BATCH_SIZE):
+        batch = changed[start:start + LOOKUP_BATCH_SIZE]
+        for document_id in batch:
+            retriever.remove_document(document_id)
+        retriever.add_chunks(ChunkRepository.iter_index_rows(db, document_ids=batch))
+
+    # Chunks are only ever appended, so everything else new has a higher chunk_id
+    new_chunks = 0
+
+    def counted(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal new_chunks
+        for row in rows:
+            new_chunks += 1
+            yield row
+
+    retriever.add_chunks(counted(ChunkRepository.iter_index_rows(db, after_chunk_id=info["high_water_mark"])))
+    return {"removed_documents": len(removed), "reindexed_documents": len(changed), "new_chunks": new_chunks}
+
+
+def warm_start(db: Session, retriever: InMemoryRetriever, path: str) -> bool:
+    """
+    Fill the index from a snapshot and replay the changes made since.
+
+    Returns:
+        bool: False if the snapshot is missing or unusable and the index
+        has to be rebuilt from the database
+    """
+    started = time.perf_counter()
+    try:
+        info = load_snapshot(path, retriever)
+    except FileNotFoundError:
+        logger.info("No index snapshot at %s", path)
+        return False
+    except (OSError, ValueError, KeyError, orjson.JSONDecodeError) as e:
+        logger.warning("Ignoring index snapshot %s: %s", path, e)
+        retriever.rebuild([])
+        return False
+
+    changes = replay_changes(db, retriever, info)
+    logger.info(
+        "Loaded %s chunks from index snapshot %s and replayed %s in %.2f s",
+        info["chunk_count"], path, changes, time.perf_counter() - started
+    )
+    return True
+
+
+def rebuild_and_save(db: Session, retriever: InMemoryRetriever, path: str) -> Dict[str, Any]:
+    """Build the index from the database and save it as a snapshot."""
+    documents = DocumentRepository.get_document_versions(db)
+    retriever.rebuild(ChunkRepository.iter_index_rows(db))
+    return save_snapshot(path, retriever, documents)
+
+
+def _iter_entries(
+    rows: List[List[Any]],
+    vocabulary: List[str],
+    positions: array
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, array]]]:
+    """Decode rows and their term positions from snapshot sections."""
+    created_at = INDEX_FIELDS.index("created_at")
+    i = 0
+    for values in rows:
+        if values[created_at] is not None:
+            values[created_at] = datetime.fromisoformat(values[created_at])
+        term_count = positions[i]
+        term_ids = positions[i + 1:i + 1 + term_count]
+        ends = list(accumulate(positions[i + 1 + term_count:i + 1 + 2 * term_count], initial=i + 1 + 2 * term_count))
+        term_offsets = {
+            vocabulary[term_id]: positions[start:end] for term_id, start, end in zip(term_ids, ends, ends[1:])
+        }
+        i = ends[-1]
+        yield dict(zip(INDEX_FIELDS, values)), term_offsets
+    if i != len(positions):
+        raise ValueError("Snapshot positions do not match its rows")
+
+
+def _unpack_header(data: bytes) -> Tuple[Dict[str, Any], bytes]:
+    """Parse the fixed header into its fields and the payload digest."""
+    if len(data) < HEADER.size:
+        raise ValueError("Not an index snapshot")
+    magic, version, high_water_mark, created_at, chunk_count, payload_size, digest = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("Not an index snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format version {version} is not supported (expected {FORMAT_VERSION})")
+    return {
+        "format_version": version,
+        "high_water_mark": high_water_mark,
+        "created_at": created_at,
+        "chunk_count": chunk_count,
+        "payload_size": payload_size
+    }, digest
+
+
+def _split_sections(payload: memoryview, count: int) -> List[memoryview]:
+    """Cut the payload into its length-prefixed sections."""
+    sections = []
+    offset = 0
+    for _ in range(count):
+        if offset + SECTION_LENGTH.size > len(payload):
+            raise ValueError("Snapshot is truncated")
+        (length,) = SECTION_LENGTH.unpack_from(payload, offset)
+        offset += SECTION_LENGTH.size
+        sections.append(payload[offset:offset + length])
+        offset += length
+    if offset != len(payload):
+        raise ValueError("Snapshot has unexpected trailing data")
+    return sections
+
+
+def _version(updated_at: Any) -> Optional[str]:
+    """A document's update time in the form stored in snapshots."""
+    if updated_at is None:
+        return None
+    return updated_at.isoformat() if isinstance(updated_at, datetime) else str(updated_at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect retrieval index snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build a snapshot from the database")
+    build.add_argument("--output", required=True, help="Snapshot file to create or replace")
+    inspect = commands.add_parser("inspect", help="Check a snapshot and print its header")
+    inspect.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from app.database.connection import SessionLocal
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            info = rebuild_and_save(db, InMemoryRetriever(), args.output)
+        finally:
+            db.close()
+        print(
+            f"Wrote {info['chunk_count']} chunks up to chunk_id {info['high_water_mark']} "
+            f"to {args.output} in {time.perf_counter() - started:.1f} s"
+        )
+    else:
+        info = read_header(args.path)
+        created_at = datetime.fromtimestamp(info["created_at"]).isoformat(timespec="seconds")
+        print(
+            f"{args.path}: format {info['format_version']}, {info['chunk_count']} chunks, "
+            f"high-water mark {info['high_water_mark']}, created {created_at}, "
+            f"{info['payload_size'] / 1e6:.1f} MB, checksum OK"
+        )
+
+
+if __name__ == "__main__":
+    main()
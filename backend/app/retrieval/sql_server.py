@@ -0,0 +1,58 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database.repository import ChunkRepository
+from app.models.models import QueryFilters
+from app.retrieval.base import BaseRetriever, calculate_keyword_score, select_top
+
+# Rows scored between checks of a retrieval deadline
+DEADLINE_CHECK_INTERVAL = 256
+
+
+class SqlServerRetriever(BaseRetriever):
+    """
+    Retrieval straight from the SQL Server tables.
+
+    Candidates (one per stored chunk body, pre-filtered in SQL) are streamed
+    from the database and scored by keyword matching in Python.
+    """
+
+    name = "sqlserver"
+
+    def search(
+        self,
+        db: Session,
+        queries: List[Tuple[List[str], int]],
+        filters: Optional[QueryFilters] = None,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], bool]:
+        """Score every query against each candidate in a single pass over the rows."""
+        chunks = []
+        scores = [[] for _ in queries]
+        partial = False
+
+        candidates = ChunkRepository.iter_retrieval_candidates(db, filters=filters)
+        for chunk in candidates:
+            # Score every query against each chunk while its lowercased text is at hand
+            content = chunk["content"].lower()
+            for query_scores, (keywords, _) in zip(scores, queries):
+                query_scores.append(calculate_keyword_score(content, keywords))
+            chunks.append(chunk)
+
+            # Past the deadline, go ahead with the best chunks seen so far
+            if deadline is not None and len(chunks) % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() >= deadline:
+                partial = True
+                candidates.close()
+                break
+
+        results = [
+            select_top(chunks, query_scores, max_chunks)
+            for query_scores, (_, max_chunks) in zip(scores, queries)
+        ]
+        return results, partial
+
+    def get_chunks(self, db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks by ID from the database."""
+        return ChunkRepository.get_chunks_by_ids(db, chunk_ids)
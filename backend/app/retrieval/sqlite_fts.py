@@ -0,0 +1,302 @@
+import fcntl
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import QueryFilters
+from app.retrieval.base import BaseRetriever, CHUNK_FIELDS, select_top, term_positions
+
+# Rows fetched per requested chunk, so collapsing near-duplicates still fills max_chunks
+CLUSTER_OVERFETCH = 4
+
+# Bumped when the sidecar layout changes; an index with another version is rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS chunk_meta (
+        chunk_id INTEGER PRIMARY KEY,
+        document_id INTEGER NOT NULL,
+        chunk_order INTEGER,
+        cluster_id INTEGER,
+        document_title TEXT,
+        document_source TEXT,
+        document_type TEXT,
+        created_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ix_chunk_meta_document ON chunk_meta (document_id);
+    CREATE INDEX IF NOT EXISTS ix_chunk_meta_type ON chunk_meta (document_type);
+    CREATE INDEX IF NOT EXISTS ix_chunk_meta_source ON chunk_meta (document_source);
+    CREATE INDEX IF NOT EXISTS ix_chunk_meta_created ON chunk_meta (created_at);
+    CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(content, tokenize = 'unicode61');
+    CREATE TABLE IF NOT EXISTS chunk_positions (
+        chunk_id INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        offsets BLOB NOT NULL,
+        PRIMARY KEY (chunk_id, term)
+    ) WITHOUT ROWID;
+"""
+
+DROP_SCHEMA = """
+    DROP TABLE IF EXISTS chunk_meta;
+    DROP TABLE IF EXISTS chunk_fts;
+    DROP TABLE IF EXISTS chunk_positions;
+"""
+
+
+class SqliteFtsRetriever(BaseRetriever):
+    """
+    Retrieval from an embedded SQLite FTS5 index ranked with bm25().
+
+    The index lives in a sidecar file next to the application, so every
+    worker on the host shares it and it survives restarts. It needs no
+    database server to answer queries, which suits edge and test deployments.
+    The character offsets of each term are stored alongside, so snippets of
+    returned chunks are cut without tokenizing them again. Workers sharing
+    the file take turns on a lock file to set up and build it, so it is
+    built once.
+    """
+
+    name = "sqlite_fts"
+    maintains_index = True
+
+    def __init__(self, path: str):
+        """Open (and create if needed) the sidecar index."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._build_lock():
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # Start empty, so the application rebuilds the index at startup
+                self._conn.executescript(DROP_SCHEMA)
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.executescript(SCHEMA)
+
+    def search(
+        self,
+        db: Session,
+        queries: List[Tuple[List[str], int]],
+        filters: Optional[QueryFilters] = None,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], bool]:
+        """Run one FTS5 query per search, filtered on the metadata table."""
+        filter_clause, filter_params = _build_filter_clause(filters)
+        results = []
+
+        with self._lock:
+            for keywords, max_chunks in queries:
+                limit = max_chunks * CLUSTER_OVERFETCH
+                if keywords:
+                    # Keywords are word characters only, so quoting them is enough escaping
+                    match = " OR ".join(f'"{keyword}"' for keyword in dict.fromkeys(keywords))
+                    rows = self._conn.execute(f"""
+                        SELECT
+                            m.chunk_id, m.document_id, f.content, m.chunk_order, m.cluster_id,
+                            m.document_title, m.document_source, -f.rank AS relevance_score
+                        FROM chunk_fts f
+                        JOIN chunk_meta m ON m.chunk_id = f.rowid
+                        WHERE chunk_fts MATCH ? AND {filter_clause}
+                        ORDER BY f.rank, m.chunk_id
+                        LIMIT ?
+                    """, [match, *filter_params, limit]).fetchall()
+                else:
+                    # Without keywords every chunk scores zero, like the SQL Server backend
+                    rows = self._conn.execute(f"""
+                        SELECT
+                            m.chunk_id, m.document_id, f.content, m.chunk_order, m.cluster_id,
+                            m.document_title, m.document_source, 0.0 AS relevance_score
+                        FROM chunk_meta m
+                        JOIN chunk_fts f ON f.rowid = m.chunk_id
+                        WHERE {filter_clause}
+                        ORDER BY m.chunk_id
+                        LIMIT ?
+                    """, [*filter_params, limit]).fetchall()
+
+                chunks = [dict(row) for row in rows]
+                top = select_top(chunks, [c["relevance_score"] for c in chunks], max_chunks)
+                self._attach_matches(top, keywords)
+                results.append(top)
+
+        return results, False
+
+    def get_chunks(self, db: Session, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get chunks by ID from the sidecar index."""
+        if not chunk_ids:
+            return []
+        placeholders = ", ".join("?" for _ in chunk_ids)
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT {", ".join("f.content" if field == "content" else f"m.{field}" for field in CHUNK_FIELDS)}
+                FROM chunk_meta m
+                JOIN chunk_fts f ON f.rowid = m.chunk_id
+                WHERE m.chunk_id IN ({placeholders})
+            """, chunk_ids).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_chunks(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Index chunk rows, replacing any already indexed under the same chunk_id."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert(rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_document(self, document_id: int) -> None:
+        """Remove all chunks of a document."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM chunk_fts WHERE rowid IN (SELECT chunk_id FROM chunk_meta WHERE document_id = ?)",
+                    (document_id,)
+                )
+                self._conn.execute(
+                    "DELETE FROM chunk_positions WHERE chunk_id IN (SELECT chunk_id FROM chunk_meta WHERE document_id = ?)",
+                    (document_id,)
+                )
+                self._conn.execute("DELETE FROM chunk_meta WHERE document_id = ?", (document_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def is_empty(self) -> bool:
+        """Whether nothing has been indexed yet."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunk_meta LIMIT 1").fetchone() is None
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole index in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM chunk_fts")
+                self._conn.execute("DELETE FROM chunk_meta")
+                self._conn.execute("DELETE FROM chunk_positions")
+                self._insert(rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("INSERT INTO chunk_fts (chunk_fts) VALUES ('optimize')")
+
+    def fill(self, make_rows: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """
+        Build the index if it is empty, one worker at a time.
+
+        Workers wait for each other on the lock file rather than on SQLite's
+        busy timeout, which a long build would exceed, and check again once
+        they hold it, so only the first worker to start reads the chunks.
+        """
+        with self._build_lock():
+            if not self.is_empty():
+                return False
+            self.rebuild(make_rows())
+            return True
+
+    def close(self) -> None:
+        """Close the sidecar connection."""
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _build_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the sidecar's lock file, shared by all processes using it."""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _attach_matches(self, chunks: List[Dict[str, Any]], keywords: List[str]) -> None:
+        """Add the stored keyword offsets to each chunk, in text order."""
+        for chunk in chunks:
+            chunk["matches"] = []
+        terms = list(dict.fromkeys(keywords))
+        if not chunks or not terms:
+            return
+
+        by_id = {chunk["chunk_id"]: chunk for chunk in chunks}
+        rows = self._conn.execute(f"""
+            SELECT chunk_id, term, offsets FROM chunk_positions
+            WHERE chunk_id IN ({", ".join("?" for _ in by_id)})
+            AND term IN ({", ".join("?" for _ in terms)})
+        """, [*by_id, *terms])
+        for chunk_id, term, blob in rows:
+            offsets = array("I")
+            offsets.frombytes(blob)
+            by_id[chunk_id]["matches"].extend(
+                (offsets[i], offsets[i + 1], term) for i in range(0, len(offsets), 2)
+            )
+        for chunk in chunks:
+            chunk["matches"].sort()
+
+    def _insert(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Write chunk rows inside the caller's transaction."""
+        for row in rows:
+            self._conn.execute("DELETE FROM chunk_fts WHERE rowid = ?", (row["chunk_id"],))
+            self._conn.execute("DELETE FROM chunk_positions WHERE chunk_id = ?", (row["chunk_id"],))
+            self._conn.execute("""
+                INSERT OR REPLACE INTO chunk_meta (
+                    chunk_id, document_id, chunk_order, cluster_id,
+                    document_title, document_source, document_type, created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                row["chunk_id"], row["document_id"], row["chunk_order"], row["cluster_id"],
+                row["document_title"], row["document_source"], row.get("document_type"),
+                _format_timestamp(row.get("created_at"))
+            ))
+            self._conn.execute(
+                "INSERT INTO chunk_fts (rowid, content) VALUES (?, ?)",
+                (row["chunk_id"], row["content"])
+            )
+
+            positions = term_positions(row["content"])
+            self._conn.executemany(
+                "INSERT INTO chunk_positions (chunk_id, term, offsets) VALUES (?, ?, ?)",
+                ((row["chunk_id"], term, offsets.tobytes()) for term, offsets in positions.items())
+            )
+
+
+def _format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Store timestamps as fixed-width text so they sort and compare correctly."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def _build_filter_clause(filters: Optional[QueryFilters]) -> Tuple[str, List[Any]]:
+    """Build a condition on chunk_meta (alias m) from query filters."""
+    if filters is None:
+        return "1=1", []
+
+    clauses = []
+    params = []
+    if filters.document_type is not None:
+        clauses.append("m.document_type = ?")
+        params.append(filters.document_type)
+    if filters.source is not None:
+        clauses.append("m.document_source = ?")
+        params.append(filters.source)
+    if filters.created_after is not None:
+        clauses.append("m.created_at >= ?")
+        params.append(_format_timestamp(filters.created_after))
+    if filters.created_before is not None:
+        clauses.append("m.created_at < ?")
+        params.append(_format_timestamp(filters.created_before))
+
+    return (" AND ".join(clauses) if clauses else "1=1"), params
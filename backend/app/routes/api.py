@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import uuid
 
+from app.config import get_settings
 from app.database.connection import get_db
 from app.models.models import (
-    QueryRequest, QueryResponse, Document, Chunk,
-    DocumentCreate, DocumentUpdate, ChunkCreate, ChunkUpdate
+    QueryRequest, QueryResponse, BatchQueryRequest, ConversationSession, ConversationTurn, Document, Chunk,
+    DocumentCreate, DocumentUpdate, ChunkCreate, ChunkUpdate, HotQueryReport
 )
 from app.database.repository import DocumentRepository, ChunkRepository
 from app.services.rag_service import RAGService
+from app.services.admission import get_admission_controller
+from app.services.chunking import TokenizerUnavailableError
+from app.services.llm_cache import get_llm_cache
+from app.services.retrieval_cache import get_retrieval_cache
+from app.services.query_analytics import build_hot_query_report, prewarm_caches
+from app.routes.responses import RowsJSONResponse, chunk_fields_excluded, model_response
 
 router = APIRouter()
 
@@ -16,32 +26,160 @@ router = APIRouter()
 @router.post("/query", response_model=QueryResponse)
 async def process_query(
     query_request: QueryRequest,
+    x_request_deadline_ms: Optional[float] = Header(
+        None, gt=0, description="Milliseconds the client will wait for the response"
+    ),
     db: Session = Depends(get_db)
 ):
     """
     Process a query using RAG.
+    
+    Under overload the query is answered with the retrieved chunks only
+    (metadata.degraded), or refused with a 503 and Retry-After before any
+    database or LLM work when X-Request-Deadline-Ms can't be met.
     """
+    deadline_ms = x_request_deadline_ms or get_settings().default_request_deadline_ms or None
+    admission = {"decision": "admit", "reason": None, "deadline": None}
+    controller = get_admission_controller()
+    if controller is not None:
+        admission = controller.admit(deadline_ms, allow_degraded=query_request.allow_degraded is not False)
+        if admission["decision"] == "reject":
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Query can't be answered in time ({admission['reason']}), retry later",
+                headers={"Retry-After": str(admission["retry_after"])}
+            )
+    
     try:
         rag_service = RAGService(db)
-        response = rag_service.process_query(query_request)
-        return response
+        # Off the event loop, so concurrent queries queue for LLM slots where admission control sees them
+        response = await run_in_threadpool(
+            rag_service.process_query,
+            query_request,
+            admission["deadline"],
+            admission["reason"] if admission["decision"] == "degrade" else None
+        )
+        return model_response(
+            response, exclude={"chunks": {"__all__": chunk_fields_excluded(query_request.include_chunk_content)}}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing query: {str(e)}"
         )
+    finally:
+        if controller is not None:
+            controller.release(admission)
+
+@router.post("/query/batch")
+async def process_query_batch(
+    batch_request: BatchQueryRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Process a batch of queries using RAG.
+    
+    Results are streamed back as newline-delimited JSON, one line per query
+    as soon as its answer is ready, each tagged with the query's index in the batch.
+    """
+    rag_service = RAGService(db)
+    results = rag_service.process_batch(batch_request)
+    return StreamingResponse(
+        (
+            result.model_dump_json(exclude={"response": {"chunks": {"__all__": chunk_fields_excluded(
+                batch_request.queries[result.index].include_chunk_content
+            )}}}) + "\n"
+            for result in results
+        ),
+        media_type="application/x-ndjson"
+    )
+
+# Conversation Session Endpoints
+@router.post("/sessions", response_model=ConversationSession, status_code=status.HTTP_201_CREATED)
+async def create_session():
+    """
+    Start a conversation session. Pass its session_id with each query to continue it.
+    """
+    return ConversationSession(session_id=uuid.uuid4().hex)
+
+@router.get("/sessions/{session_id}", response_model=ConversationSession)
+async def get_session(
+    session_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the turns of a conversation session.
+    """
+    turns = ChunkRepository.get_session_turns(db, session_id)
+    return ConversationSession(
+        session_id=session_id,
+        turns=[
+            ConversationTurn(
+                query_id=turn["query_id"],
+                query=turn["query_text"],
+                response=turn["response_text"],
+                created_at=turn["created_at"]
+            )
+            for turn in turns
+        ]
+    )
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats():
+    """
+    Get hit ratios and sizes of this worker's retrieval and LLM caches.
+    """
+    retrieval_cache = get_retrieval_cache()
+    llm_cache = get_llm_cache()
+    return {
+        "retrieval": retrieval_cache.stats() if retrieval_cache is not None else None,
+        "llm": llm_cache.stats() if llm_cache is not None else None
+    }
+
+@router.get("/admission/stats", response_model=Dict[str, Any])
+async def get_admission_stats():
+    """
+    Get this worker's admission decisions, LLM queue depth and stage latency estimates.
+    """
+    controller = get_admission_controller()
+    return controller.stats() if controller is not None else {"enabled": False}
+
+# Query Analytics Endpoints
+@router.get("/analytics/hot-queries", response_model=HotQueryReport)
+async def get_hot_queries(
+    limit: int = Query(20, ge=1, le=1000),
+    window_days: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the most frequent queries in the query log and the chunks they retrieved.
+    """
+    return build_hot_query_report(db, top_n=limit, window_days=window_days)
+
+@router.post("/analytics/prewarm", response_model=Dict[str, Any])
+async def prewarm(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Replay the hottest logged queries to warm this worker's caches, e.g. after a deploy.
+    """
+    return prewarm_caches(db, query_count=limit)
 
 # Document Endpoints
 @router.get("/documents", response_model=List[Dict[str, Any]])
 async def get_documents(
     skip: int = 0, 
     limit: int = 10,
+    include_content: bool = True,
     db: Session = Depends(get_db)
 ):
     """
-    Get all documents with pagination.
+    Get all documents with pagination. Pass include_content=false to list metadata only.
     """
-    return DocumentRepository.get_documents(db, skip=skip, limit=limit)
+    return RowsJSONResponse(
+        DocumentRepository.get_documents(db, skip=skip, limit=limit, include_content=include_content)
+    )
 
 @router.get("/documents/{document_id}", response_model=Dict[str, Any])
 async def get_document(
@@ -57,7 +195,7 @@ async def get_document(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Document with ID {document_id} not found"
         )
-    return document
+    return RowsJSONResponse(document)
 
 @router.post("/documents", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
 async def create_document(
@@ -113,20 +251,22 @@ async def delete_document(
 @router.get("/documents/{document_id}/chunks", response_model=List[Dict[str, Any]])
 async def get_document_chunks(
     document_id: int,
+    include_content: bool = True,
     db: Session = Depends(get_db)
 ):
     """
-    Get all chunks for a document.
+    Get all chunks for a document. Pass include_content=false to list metadata only.
     """
     # First check if document exists
-    document = DocumentRepository.get_document_by_id(db, document_id)
-    if not document:
+    if not DocumentRepository.document_exists(db, document_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Document with ID {document_id} not found"
         )
     
-    return ChunkRepository.get_chunks_by_document(db, document_id)
+    return RowsJSONResponse(
+        ChunkRepository.get_chunks_by_document(db, document_id, include_content=include_content)
+    )
 
 @router.post("/chunks", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
 async def create_chunk(
@@ -154,25 +294,40 @@ async def create_chunk(
 @router.post("/documents/{document_id}/process", response_model=Dict[str, Any])
 async def process_document(
     document_id: int,
+    strategy: Optional[str] = None,
+    chunk_size: Optional[int] = Query(None, ge=1),
+    chunk_overlap: Optional[int] = Query(None, ge=0),
     db: Session = Depends(get_db)
 ):
     """
     Process a document - create chunks for the document.
+    
+    The chunking strategy defaults to the one configured for the document's
+    type; strategy, chunk_size and chunk_overlap override it.
     """
     # Check if document exists
-    document = DocumentRepository.get_document_by_id(db, document_id)
-    if not document:
+    if not DocumentRepository.document_exists(db, document_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Document with ID {document_id} not found"
         )
     
     rag_service = RAGService(db)
-    num_chunks = rag_service.chunk_document(document_id)
+    try:
+        num_chunks, chunking_strategy = rag_service.chunk_document(
+            document_id, strategy=strategy, chunk_size=chunk_size, overlap=chunk_overlap
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except TokenizerUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     
     return {
         "document_id": document_id,
         "chunks_created": num_chunks,
+        "strategy": chunking_strategy.name,
+        "chunk_size": chunking_strategy.chunk_size,
+        "chunk_overlap": chunking_strategy.chunk_overlap,
         "status": "success",
         "message": f"Successfully processed document and created {num_chunks} chunks"
     }
\ No newline at end of file
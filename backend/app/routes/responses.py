@@ -0,0 +1,66 @@
+from typing import Any, Iterable
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RowsJSONResponse(JSONResponse):
+    """
+    JSON response for database rows, encoded with orjson.
+
+    Routes return it directly, which skips FastAPI's validation and
+    jsonable_encoder pass over every row.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(model: BaseModel, status_code: int = 200, **dump_options: Any) -> Response:
+    """
+    Serialize a Pydantic model with its compiled serializer.
+
+    Args:
+        model (BaseModel): The response model
+        status_code (int): HTTP status code
+        **dump_options: Options for model_dump_json, e.g. exclude
+
+    Returns:
+        Response: The JSON response
+    """
+    return Response(model.model_dump_json(**dump_options), status_code=status_code, media_type="application/json")
+
+
+def chunk_fields_excluded(include_chunk_content: bool) -> set:
+    """Fields of RetrievedChunk left out of a response: whole content or the snippet."""
+    return {"snippet", "highlights"} if include_chunk_content else {"content"}
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves some paths uncompressed.
+
+    Starlette's gzip buffers streamed bodies, which would hold back results
+    of streaming endpoints until enough output has built up.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        compresslevel: int = 9,
+        exclude_paths: Iterable[str] = ()
+    ) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from app.config import get_settings
+
+# Weight of the newest sample in the moving average of each stage's latency
+LATENCY_SMOOTHING = 0.2
+
+# Longest Retry-After sent with a rejection, in seconds
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class AdmissionController:
+    """
+    Admission control for /api/query, run before a request touches the database.
+
+    It keeps moving averages of the retrieval and generation stage latencies
+    and counts the admitted requests still waiting for their answer, each of
+    which holds or will queue for one of the llm_concurrency LLM slots. From
+    those it estimates when a new request would finish and decides:
+
+    - "admit" when the request can meet its deadline,
+    - "degrade" (retrieved chunks only, no generation) when the LLM queue is
+      saturated or generation would miss the deadline but retrieval would not,
+    - "reject" when not even retrieval can meet the deadline, or the client
+      does not accept degraded answers; the response is a 503 with Retry-After.
+
+    Every admitted request must be released once answered. Estimates are
+    per worker; each worker sees only its own queue.
+    """
+
+    def __init__(self, llm_concurrency: int, degrade_queue_depth: int):
+        """Initialize the controller with no latency samples yet."""
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.degrade_queue_depth = degrade_queue_depth
+
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Optional[float]] = {"retrieval": None, "generation": None}
+        self._in_flight = 0
+        self._decisions = {"admit": 0, "degrade": 0, "reject": 0, "expired": 0}
+
+    def admit(self, deadline_ms: Optional[float], allow_degraded: bool = True) -> Dict[str, Any]:
+        """
+        Decide whether to serve a request.
+
+        Args:
+            deadline_ms (Optional[float]): Time the client will wait, from now; None for no deadline
+            allow_degraded (bool): Whether the client accepts chunks without a generated answer
+
+        Returns:
+            Dict[str, Any]: "decision" ("admit", "degrade" or "reject"), the "reason"
+            for anything but admit, "deadline"
+            (a time.monotonic() value, or None), "retry_after" seconds for rejections
+            and the "estimate" of each stage in milliseconds
+        """
+        now = time.monotonic()
+        with self._lock:
+            estimate = self._estimate()
+            finish = sum(estimate.values())
+            saturated = self.degrade_queue_depth > 0 and self._in_flight >= self.degrade_queue_depth
+
+            reason = None
+            if deadline_ms is not None and estimate["retrieval"] > deadline_ms / 1000:
+                decision, reason = "reject", "retrieval_too_slow"
+            elif saturated or (deadline_ms is not None and finish > deadline_ms / 1000):
+                reason = "llm_queue_saturated" if saturated else "deadline_too_short"
+                decision = "degrade" if allow_degraded else "reject"
+            else:
+                decision = "admit"
+                self._in_flight += 1
+            self._decisions[decision] += 1
+
+        return {
+            "decision": decision,
+            "reason": reason,
+            "deadline": now + deadline_ms / 1000 if deadline_ms is not None else None,
+            "retry_after": min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(estimate["queue_wait"] + estimate["generation"]))),
+            "estimate": {stage: round(seconds * 1000, 1) for stage, seconds in estimate.items()}
+        }
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add a latency sample for "retrieval" or "generation"."""
+        with self._lock:
+            average = self._latency[stage]
+            self._latency[stage] = seconds if average is None else average + LATENCY_SMOOTHING * (seconds - average)
+
+    def release(self, admission: Dict[str, Any]) -> None:
+        """Remove a request from the LLM queue once it has been answered, if admit let it in."""
+        if admission["decision"] != "admit":
+            return
+        with self._lock:
+            self._in_flight -= 1
+
+    def record_expired(self) -> None:
+        """Count an admitted request whose deadline passed before an LLM slot freed up."""
+        with self._lock:
+            self._decisions["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get decision counts, admitted requests in flight and stage estimates for this process."""
+        with self._lock:
+            return {
+                **self._decisions,
+                "in_flight": self._in_flight,
+                "estimate_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self._estimate().items()}
+            }
+
+    def _estimate(self) -> Dict[str, float]:
+        """Expected seconds in each stage for a request arriving now; call with the lock held."""
+        retrieval = self._latency["retrieval"] or 0.0
+        generation = self._latency["generation"] or 0.0
+        # Requests ahead of this one that are not yet generating drain llm_concurrency at a time
+        waiting = max(0, self._in_flight + 1 - self.llm_concurrency)
+        return {
+            "retrieval": retrieval,
+            "queue_wait": waiting / self.llm_concurrency * generation,
+            "generation": generation
+        }
+
+
+@lru_cache()
+def get_admission_controller() -> Optional[AdmissionController]:
+    """
+    Get the process-wide admission controller.
+
+    Returns:
+        Optional[AdmissionController]: The controller, or None if admission control is disabled.
+    """
+    settings = get_settings()
+    if not settings.admission_control_enabled:
+        return None
+    return AdmissionController(
+        llm_concurrency=settings.llm_max_concurrency,
+        degrade_queue_depth=settings.llm_queue_degrade_depth
+    )
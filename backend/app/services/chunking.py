@@ -0,0 +1,213 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from app.config import get_settings
+from app.services.streaming_splitter import StreamingTextSplitter
+
+logger = logging.getLogger(__name__)
+
+# Encoding used by the token-based strategy (that of the GPT-4 family)
+TOKEN_ENCODING = "cl100k_base"
+
+# Seconds to wait for tiktoken to load the encoding; unless it is already in
+# TIKTOKEN_CACHE_DIR, tiktoken downloads it with no timeout of its own
+ENCODING_LOAD_TIMEOUT_SECONDS = 30
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+class TokenizerUnavailableError(RuntimeError):
+    """Raised when token-based chunking is used but the tokenizer cannot be loaded."""
+
+
+class ChunkingStrategy:
+    """
+    How a document is split into chunks: the separators tried, in order, and
+    the chunk size and overlap, measured in characters or tokens.
+
+    Separators are literal strings so the top-level one can be found in the
+    database and the text can be streamed (see StreamingTextSplitter).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        separators: List[str],
+        chunk_size: int,
+        chunk_overlap: int,
+        length_unit: str = "chars",
+        keep_separator: str = "start"
+    ):
+        """Initialize a chunking strategy."""
+        self.name = name
+        self.separators = separators
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.keep_separator = keep_separator
+
+    def with_sizes(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None) -> "ChunkingStrategy":
+        """Copy the strategy with a different chunk size or overlap."""
+        return ChunkingStrategy(
+            self.name,
+            self.separators,
+            chunk_size if chunk_size is not None else self.chunk_size,
+            chunk_overlap if chunk_overlap is not None else self.chunk_overlap,
+            self.length_unit,
+            self.keep_separator
+        )
+
+    def make_splitter(self) -> StreamingTextSplitter:
+        """Build the splitter for this strategy."""
+        length_function: Callable[[str], int] = token_length if self.length_unit == "tokens" else len
+        return StreamingTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            length_function=length_function,
+            separators=self.separators,
+            keep_separator=self.keep_separator
+        )
+
+
+STRATEGIES: Dict[str, ChunkingStrategy] = {
+    # LangChain's default separators, as the application has always used
+    "recursive": ChunkingStrategy("recursive", ["\n\n", "\n", " ", ""], 500, 50),
+    # Paragraphs, then sentences and clauses, so chunks rarely end mid-sentence;
+    # punctuation stays at the end of the sentence it closes
+    "sentence": ChunkingStrategy(
+        "sentence", ["\n\n", "\n", ". ", "? ", "! ", "; ", ", ", " ", ""], 400, 40, keep_separator="end"
+    ),
+    # Sized in model tokens, so prompt cost per chunk is predictable
+    "token": ChunkingStrategy("token", ["\n\n", "\n", " ", ""], 128, 16, length_unit="tokens"),
+    # Whole sections under headings; fenced code blocks are kept apart
+    "markdown": ChunkingStrategy(
+        "markdown",
+        ["\n# ", "\n## ", "\n### ", "\n#### ", "\n```", "\n---\n", "\n\n", "\n", " ", ""],
+        1000, 100
+    ),
+    # Top-level definitions first; functions are rarely useful cut in half
+    "code": ChunkingStrategy(
+        "code",
+        ["\nclass ", "\ndef ", "\nasync def ", "\nfunction ", "\n    def ", "\n\tdef ", "\n\n", "\n", " ", ""],
+        1200, 100
+    )
+}
+
+# Strategy used for each document_type unless CHUNKING_STRATEGIES overrides it
+DOCUMENT_TYPE_STRATEGIES: Dict[str, str] = {
+    "markdown": "markdown",
+    "md": "markdown",
+    "code": "code",
+    "python": "code",
+    "javascript": "code",
+    "faq": "sentence",
+    "article": "sentence",
+    "policy": "sentence"
+}
+
+
+def get_strategy(name: str) -> ChunkingStrategy:
+    """
+    Get a chunking strategy by name.
+
+    Raises:
+        ValueError: If there is no strategy with that name
+    """
+    strategy = STRATEGIES.get(name.lower())
+    if strategy is None:
+        raise ValueError(f"Unknown chunking strategy: {name}. Available: {', '.join(STRATEGIES)}")
+    return strategy
+
+
+def strategy_for_document_type(document_type: Optional[str]) -> ChunkingStrategy:
+    """
+    Get the chunking strategy configured for a document type.
+
+    Args:
+        document_type (Optional[str]): The document's type
+
+    Returns:
+        ChunkingStrategy: The strategy for the type, or the default strategy
+    """
+    settings = get_settings()
+    overrides = _parse_overrides(settings.chunking_strategies)
+    mapping = {**DOCUMENT_TYPE_STRATEGIES, **overrides}
+    name = mapping.get((document_type or "").lower(), settings.chunking_default_strategy)
+    return get_strategy(name)
+
+
+def configured_strategies() -> Set[str]:
+    """Names of the strategies documents are chunked with by default, per type and otherwise."""
+    settings = get_settings()
+    overrides = _parse_overrides(settings.chunking_strategies)
+    names = {*DOCUMENT_TYPE_STRATEGIES.values(), *overrides.values(), settings.chunking_default_strategy}
+    return {name.lower() for name in names}
+
+
+def uses_token_strategy() -> bool:
+    """Whether any configured strategy sizes chunks in tokens."""
+    return any(
+        STRATEGIES[name].length_unit == "tokens" for name in configured_strategies() if name in STRATEGIES
+    )
+
+
+def token_length(text: str) -> int:
+    """
+    Length of text in model tokens.
+
+    Raises:
+        TokenizerUnavailableError: If the tokenizer cannot be loaded
+    """
+    return len(load_encoding().encode(text, disallowed_special=()))
+
+
+def load_encoding(timeout: float = ENCODING_LOAD_TIMEOUT_SECONDS):
+    """
+    Get the tokenizer used by token-based chunking, loading it on first use.
+
+    There is no fallback to estimated counts: they would put chunk boundaries
+    in different places depending on which worker chunked a document.
+
+    Args:
+        timeout (float): Seconds to wait for the encoding to load or download
+
+    Returns:
+        tiktoken.Encoding: The tokenizer
+
+    Raises:
+        TokenizerUnavailableError: If the encoding fails to load or times out
+    """
+    if _encoding is not None:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            errors: List[Exception] = []
+            thread = threading.Thread(target=_load_encoding, args=(errors,), name="tokenizer-load", daemon=True)
+            thread.start()
+            thread.join(timeout)
+            if _encoding is None:
+                reason = errors[0] if errors else f"timed out after {timeout:g} seconds"
+                raise TokenizerUnavailableError(f"Could not load the {TOKEN_ENCODING} tokenizer: {reason}")
+    return _encoding
+
+
+def _load_encoding(errors: List[Exception]) -> None:
+    """Load the encoding into _encoding; a load that outlives its timeout still completes."""
+    global _encoding
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        errors.append(e)
+
+
+def _parse_overrides(value: str) -> Dict[str, str]:
+    """Parse "type=strategy,type=strategy" from the CHUNKING_STRATEGIES setting."""
+    overrides = {}
+    for pair in value.split(","):
+        if "=" in pair:
+            document_type, name = pair.split("=", 1)
+            overrides[document_type.strip().lower()] = name.strip()
+    return overrides
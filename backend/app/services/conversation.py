@@ -0,0 +1,73 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Old turns are dropped this many at a time, so the history prefix of the
+# prompt stays byte-identical across several follow-up turns
+HISTORY_TRIM_STEP = 4
+
+# Longest excerpt of a dropped question kept in the history summary
+SUMMARY_QUESTION_CHARS = 120
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def trim_history(
+    turns: List[Dict[str, Any]],
+    token_budget: int,
+    trim_step: int = HISTORY_TRIM_STEP
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fit conversation history into a token budget.
+
+    The oldest turns are dropped in blocks of trim_step counted from the first
+    turn given, and replaced by a short summary of what was asked. Load turns
+    so the first one falls on a block boundary of the session (see
+    ChunkRepository.get_session_turns align) to keep the blocks fixed as the
+    session grows.
+
+    Args:
+        turns (List[Dict[str, Any]]): Previous turns, oldest first
+        token_budget (int): Tokens allowed for kept turns and the summary
+        trim_step (int): Number of turns dropped at a time
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The kept turns and the
+        summary of dropped turns, or None if nothing was dropped
+    """
+    costs = [estimate_tokens(t["query_text"]) + estimate_tokens(t["response_text"]) for t in turns]
+    summary_budget = token_budget // 4
+
+    start = 0
+    while start < len(turns) and sum(costs[start:]) > token_budget - summary_budget:
+        start += trim_step
+
+    dropped, kept = turns[:start], turns[start:]
+    if not dropped:
+        return kept, None
+
+    # Summarize the most recent dropped questions that fit the summary budget
+    questions = []
+    used = 0
+    for turn in reversed(dropped):
+        question = " ".join(turn["query_text"].split())[:SUMMARY_QUESTION_CHARS]
+        used += estimate_tokens(question)
+        if used > summary_budget:
+            break
+        questions.append(question)
+
+    summary = None
+    if questions:
+        summary = "Earlier in this conversation the user asked: " + "; ".join(reversed(questions))
+    return kept, summary
+
+
+def warm_chunk_ids(turns: List[Dict[str, Any]]) -> List[int]:
+    """Chunk IDs retrieved in earlier turns, most recent first, without duplicates."""
+    chunk_ids = []
+    for turn in reversed(turns):
+        chunk_ids.extend((turn.get("metadata") or {}).get("chunk_ids", []))
+    return list(dict.fromkeys(chunk_ids))
@@ -0,0 +1,24 @@
+import time
+from typing import List
+
+from langchain.schema import AIMessage, BaseMessage
+
+
+class FakeChatModel:
+    """
+    Stand-in for the chat model that answers after a fixed delay.
+
+    Selected with LLM_BACKEND=fake, so load tests and benchmarks can exercise
+    the LLM queue without an endpoint or token costs.
+    """
+
+    def __init__(self, latency_ms: float, temperature: float = 0.7):
+        """Initialize the model with the time each call takes."""
+        self.latency_ms = latency_ms
+        self.temperature = temperature
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        """Wait latency_ms, then answer with an echo of the question."""
+        time.sleep(self.latency_ms / 1000)
+        question = messages[-1].content.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+        return AIMessage(content=f"Fake answer to: {question}")
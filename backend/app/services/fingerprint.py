@@ -0,0 +1,64 @@
+import hashlib
+import re
+from typing import List
+
+# Bodies whose SimHash differs in at most this many bits are near-duplicates
+NEAR_DUPLICATE_DISTANCE = 3
+
+# The 64-bit SimHash is split into this many 16-bit bands. With at most
+# NEAR_DUPLICATE_DISTANCE differing bits, near-duplicates always share a band.
+SIMHASH_BANDS = 4
+
+SHINGLE_SIZE = 3
+
+
+def content_hash(text: str) -> bytes:
+    """
+    Exact fingerprint of a chunk body.
+
+    Hashes the UTF-16LE encoding so the value matches
+    HASHBYTES('SHA2_256', content) on an NVARCHAR column in SQL Server.
+    """
+    return hashlib.sha256(text.encode("utf-16-le")).digest()
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of a chunk body over lowercase word shingles.
+
+    Returned as a signed integer so it fits a BIGINT column.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def simhash_bands(fingerprint: int) -> List[int]:
+    """Split a SimHash into its 16-bit bands for candidate lookup."""
+    unsigned = fingerprint & 0xFFFFFFFFFFFFFFFF
+    return [(unsigned >> (16 * band)) & 0xFFFF for band in range(SIMHASH_BANDS)]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two SimHash values."""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def is_near_duplicate(a: int, b: int) -> bool:
+    """Check whether two SimHash values are near-duplicates."""
+    return hamming_distance(a, b) <= NEAR_DUPLICATE_DISTANCE
@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Run shared-tier eviction once every this many writes
+EVICTION_INTERVAL = 64
+
+
+class LLMCache:
+    """
+    Exact-match cache for LLM responses keyed on the rendered prompt.
+
+    A small in-process LRU tier answers repeated prompts without I/O. A shared
+    SQLite tier lets every worker on the host reuse responses the others paid
+    for. Both tiers expire entries after a TTL and evict by total size.
+
+    The cache never fails a request: shared-tier errors, such as a database
+    locked by other workers for longer than the busy timeout, are logged and
+    count as misses or skipped writes. If the shared tier cannot be opened
+    at all, the cache runs with the local tier only. Each thread uses its own SQLite
+    connection, outside the lock guarding the local tier.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_bytes: int, local_max_bytes: int):
+        """Initialize the cache and create the shared tier if needed."""
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.local_max_bytes = local_max_bytes
+
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._local_bytes = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "errors": 0}
+        self._connections = threading.local()
+
+        self.shared = True
+        try:
+            self._create_shared()
+        except sqlite3.Error as e:
+            logger.warning("LLM cache %s is unavailable, caching in this worker only: %s", path, e)
+            self.shared = False
+            self._stats["errors"] += 1
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float) -> str:
+        """Build the cache key for a fully rendered prompt."""
+        digest = hashlib.sha256()
+        for part in (model, repr(float(temperature)), prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss."""
+        now = time.time()
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    self._stats["local_hits"] += 1
+                    return response
+                self._remove_local(key)
+            if not self.shared:
+                self._stats["misses"] += 1
+                return None
+
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning("LLM cache lookup failed, treating it as a miss: %s", e)
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if row is None or row[1] <= now:
+                self._stats["misses"] += 1
+                return None
+            self._stats["shared_hits"] += 1
+            self._put_local(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response in both tiers."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        size = len(key) + len(response.encode("utf-8"))
+
+        with self._lock:
+            self._put_local(key, response, expires_at)
+            self._writes += 1
+            evict = self._writes % EVICTION_INTERVAL == 0
+        if not self.shared:
+            return
+
+        try:
+            self._connection().execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (cache_key, response, size, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, response, size, expires_at, now)
+            )
+            if evict:
+                self._evict_shared(now)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed, keeping the response in this worker only: %s", e)
+            with self._lock:
+                self._stats["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit and size statistics for this process."""
+        with self._lock:
+            lookups = self._stats["local_hits"] + self._stats["shared_hits"] + self._stats["misses"]
+            hits = self._stats["local_hits"] + self._stats["shared_hits"]
+            return {
+                **self._stats,
+                "shared": self.shared,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "local_entries": len(self._local),
+                "local_bytes": self._local_bytes
+            }
+
+    def _create_shared(self) -> None:
+        """Create the shared tier's table if needed."""
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection to the shared tier."""
+        conn = getattr(self._connections, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.conn = conn
+        return conn
+
+    def _put_local(self, key: str, response: str, expires_at: float) -> None:
+        """Add an entry to the local tier, evicting least recently used entries."""
+        self._remove_local(key)
+        self._local[key] = (expires_at, response)
+        self._local_bytes += len(key) + len(response)
+        while self._local_bytes > self.local_max_bytes and self._local:
+            self._remove_local(next(iter(self._local)))
+
+    def _remove_local(self, key: str) -> None:
+        """Remove an entry from the local tier if present."""
+        entry = self._local.pop(key, None)
+        if entry is not None:
+            self._local_bytes -= len(key) + len(entry[1])
+
+    def _evict_shared(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        conn = self._connection()
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM llm_cache ORDER BY last_access"):
+            stale_keys.append((cache_key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", stale_keys)
+
+
+@lru_cache()
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Get the process-wide LLM cache.
+
+    Returns:
+        Optional[LLMCache]: The cache, or None if caching is disabled.
+    """
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+    return LLMCache(
+        path=settings.llm_cache_path,
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+        max_bytes=settings.llm_cache_max_bytes,
+        local_max_bytes=settings.llm_cache_local_max_bytes
+    )
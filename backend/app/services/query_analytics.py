@@ -0,0 +1,135 @@
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database.repository import ChunkRepository
+from app.models.models import HotChunk, HotQuery, HotQueryReport, QueryFilters, QueryRequest
+from app.services.rag_service import RAGService
+
+# Chunks listed for each hot query, and across all of them
+TOP_CHUNKS_PER_QUERY = 10
+TOP_CHUNKS = 50
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation, so trivial variants group together."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+def build_hot_query_report(
+    db: Session,
+    top_n: int = 20,
+    window_days: Optional[int] = None,
+    scan_limit: Optional[int] = None
+) -> HotQueryReport:
+    """
+    Aggregate the query log into the most frequent queries and the chunks they hit.
+
+    Args:
+        db (Session): Database session
+        top_n (int): Number of hot queries to report
+        window_days (Optional[int]): Days of log to analyze, HOT_QUERY_WINDOW_DAYS by default
+        scan_limit (Optional[int]): Most recent queries to read at most, HOT_QUERY_SCAN_LIMIT by default
+
+    Returns:
+        HotQueryReport: Hot queries, most frequent first, and the most retrieved chunks
+    """
+    settings = get_settings()
+    window_days = window_days or settings.hot_query_window_days
+    logged_queries = ChunkRepository.get_recent_queries(
+        db, window_days=window_days, limit=scan_limit or settings.hot_query_scan_limit
+    )
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    hot_chunks: Counter = Counter()
+    for logged in logged_queries:
+        normalized = normalize_query(logged["query_text"])
+        if not normalized:
+            continue
+        metadata = logged["metadata"]
+        # Rows come newest first, so the first one seen gives last_seen
+        group = groups.setdefault(normalized, {
+            "count": 0,
+            "cache_hits": 0,
+            "last_seen": logged["created_at"],
+            "spellings": Counter(),
+            "options": Counter(),
+            "chunks": Counter()
+        })
+        group["count"] += 1
+        group["cache_hits"] += bool(metadata.get("llm_cache_hit"))
+        group["spellings"][logged["query_text"]] += 1
+        group["options"][(metadata.get("max_chunks"), json.dumps(metadata.get("filters"), sort_keys=True))] += 1
+        group["chunks"].update(metadata.get("chunk_ids", []))
+        hot_chunks.update(metadata.get("chunk_ids", []))
+
+    # Ties go to the most recently seen query
+    ranked = sorted(groups.items(), key=lambda item: -item[1]["count"])[:top_n]
+    analyzed = sum(group["count"] for group in groups.values())
+
+    hot_queries = []
+    for normalized, group in ranked:
+        max_chunks, filters = group["options"].most_common(1)[0][0]
+        filters = json.loads(filters)
+        hot_queries.append(HotQuery(
+            query=group["spellings"].most_common(1)[0][0],
+            normalized_query=normalized,
+            count=group["count"],
+            share=group["count"] / analyzed,
+            last_seen=group["last_seen"],
+            llm_cache_hit_ratio=group["cache_hits"] / group["count"],
+            max_chunks=max_chunks,
+            filters=QueryFilters(**filters) if filters else None,
+            chunks=[
+                HotChunk(chunk_id=chunk_id, hits=hits)
+                for chunk_id, hits in group["chunks"].most_common(TOP_CHUNKS_PER_QUERY)
+            ]
+        ))
+
+    return HotQueryReport(
+        window_days=window_days,
+        queries_analyzed=analyzed,
+        distinct_queries=len(groups),
+        hot_queries=hot_queries,
+        hot_chunks=[HotChunk(chunk_id=chunk_id, hits=hits) for chunk_id, hits in hot_chunks.most_common(TOP_CHUNKS)]
+    )
+
+
+def prewarm_caches(db: Session, query_count: Optional[int] = None, budget_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Replay the hottest logged queries so this worker starts with warm caches.
+
+    Retrieval results are cached, the index and database pages the queries
+    read are pulled into memory, and answers already in the shared LLM cache
+    are loaded into this worker's tier. No answers are generated.
+
+    Args:
+        db (Session): Database session
+        query_count (Optional[int]): Hot queries to replay, PREWARM_QUERIES by default
+        budget_seconds (Optional[float]): Time after which no more queries are started,
+            PREWARM_BUDGET_SECONDS by default
+
+    Returns:
+        Dict[str, Any]: Numbers of hot queries found, queries replayed and cached answers loaded
+    """
+    settings = get_settings()
+    started = time.monotonic()
+    deadline = started + (budget_seconds if budget_seconds is not None else settings.prewarm_budget_seconds)
+
+    report = build_hot_query_report(db, top_n=query_count or settings.prewarm_queries)
+    query_requests = []
+    for hot in report.hot_queries:
+        # Queries logged before max_chunks was validated may carry values a request no longer accepts
+        options = {"max_chunks": hot.max_chunks} if hot.max_chunks is not None and hot.max_chunks >= 1 else {}
+        query_requests.append(QueryRequest(query=hot.query, filters=hot.filters, **options))
+
+    warmed = RAGService(db).warm_caches(query_requests, deadline=deadline)
+    return {
+        "hot_queries": len(query_requests),
+        **warmed,
+        "seconds": round(time.monotonic() - started, 3)
+    }
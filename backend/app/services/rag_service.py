@@ -1,10 +1,41 @@
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 
+from app.config import get_settings
 from app.services.langchain_service import LangChainService
+from app.services.conversation import HISTORY_TRIM_STEP, trim_history, warm_chunk_ids
+from app.services.snippets import build_snippet
+from app.services.reranker import get_reranker
+from app.services.admission import AdmissionController, get_admission_controller
+from app.services.chunking import ChunkingStrategy, get_strategy, strategy_for_document_type
+from app.database.connection import SessionLocal
 from app.database.repository import ChunkRepository, DocumentRepository
-from app.models.models import QueryRequest, QueryResponse, RetrievedChunk
+from app.retrieval.factory import get_retriever
+from app.models.models import (
+    QueryRequest, QueryResponse, RetrievedChunk, BatchQueryRequest, BatchQueryResult, QueryFilters
+)
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Threads writing answered queries to the query log, each with its own database session
+QUERY_LOG_WORKERS = 2
+
+# Shared by all requests in this worker so LLM calls run off the request thread
+_generation_executor = ThreadPoolExecutor(
+    max_workers=settings.llm_max_concurrency,
+    thread_name_prefix="llm-generation"
+)
+
+_query_log_executor = ThreadPoolExecutor(
+    max_workers=QUERY_LOG_WORKERS,
+    thread_name_prefix="query-log"
+)
+
 
 class RAGService:
     """Service for RAG (Retrieval-Augmented Generation) operations."""
@@ -14,43 +45,277 @@ class RAGService:
         self.db = db
         self.langchain_service = LangChainService(db)
     
-    def process_query(self, query_request: QueryRequest) -> QueryResponse:
+    def process_query(
+        self,
+        query_request: QueryRequest,
+        request_deadline: Optional[float] = None,
+        degraded_reason: Optional[str] = None
+    ) -> QueryResponse:
         """
         Process a query using the RAG approach with LangChain.
         
+        The stages are pipelined: the prompt is sent as soon as the top chunks
+        are known, and the chunks are formatted while the LLM generates. The
+        query is logged once answered, off the request thread; a session turn
+        is logged before the response returns, so the next turn can read it. With retrieval_timeout_ms set, generation goes ahead
+        with the best chunks found when the timeout expires.
+        
+        A degraded response carries the retrieved chunks and an empty answer,
+        unless the answer is already in the LLM cache. It is returned when
+        admission control asks for one, or when the request deadline passes
+        before an LLM slot frees up.
+        
         Args:
             query_request (QueryRequest): The query request object
+            request_deadline (Optional[float]): time.monotonic() value by which the client needs the response
+            degraded_reason (Optional[str]): Why admission control skipped generation, if it did
             
         Returns:
             QueryResponse: The response including generated text and retrieved chunks
         """
         start_time = time.time()
+        deadline = request_deadline
+        if query_request.retrieval_timeout_ms is not None:
+            retrieval_deadline = time.monotonic() + query_request.retrieval_timeout_ms / 1000
+            deadline = min(deadline, retrieval_deadline) if deadline is not None else retrieval_deadline
+        controller = get_admission_controller()
+        retrieval_started = time.monotonic()
+        
+        # Load earlier turns of the conversation, if any; the window slides a whole
+        # trim block at a time so the trimmed history keeps the same prefix
+        turns = []
+        history, history_summary = None, None
+        if query_request.session_id is not None:
+            turns = ChunkRepository.get_session_turns(
+                self.db, query_request.session_id, limit=settings.session_max_turns, align=HISTORY_TRIM_STEP
+            )
+            history, history_summary = trim_history(turns, settings.session_history_token_budget)
+        
+        # Try the chunks retrieved in earlier turns before a full retrieval
+        retrieved_chunks = self._retrieve_from_session(query_request, turns)
+        warm = retrieved_chunks is not None
+        partial = False
+        rerank_info = {}
+        if not warm:
+            # Retrieve candidates using keyword matching, then keep the best after re-ranking
+            candidates, partial = self.langchain_service.retrieve_chunks_within(
+                query_request.query, 
+                max_chunks=self._candidate_count(query_request),
+                filters=query_request.filters,
+                deadline=deadline
+            )
+            retrieved_chunks, rerank_info = self._rerank(query_request, candidates)
+        if controller is not None:
+            controller.record("retrieval", time.monotonic() - retrieval_started)
+        
+        # Generate response using LangChain with context; the database session stays on this thread
+        generation = None
+        if degraded_reason is None:
+            generation = _generation_executor.submit(
+                self._generate_before,
+                controller,
+                request_deadline,
+                query_request.query,
+                retrieved_chunks,
+                history,
+                history_summary
+            )
+        
+        # Meanwhile, format retrieved chunks and build the query log metadata
+        formatted_chunks = self._format_chunks(retrieved_chunks, self._snippet_keywords(query_request))
+        metadata = {
+            "model": settings.model_name,
+            "chunks_retrieved": len(retrieved_chunks),
+            "chunk_ids": [chunk["chunk_id"] for chunk in retrieved_chunks],
+            "retrieval_method": "session_warm_set" if warm else "keyword_matching",
+            "retrieval_partial": partial,
+            **self._request_metadata(query_request),
+            **rerank_info
+        }
+        if query_request.session_id is not None:
+            metadata["session_id"] = query_request.session_id
+            metadata["session_turn"] = turns[-1]["turn_number"] + 1 if turns else 1
+            metadata["history_turns_in_prompt"] = len(history)
+        
+        response_data = generation.result() if generation is not None else None
+        if response_data is None:
+            degraded_reason = degraded_reason or "deadline_expired"
+            # Shedding the LLM call costs nothing if the answer is already cached
+            cached_response = self.langchain_service.lookup_cached_response(
+                query_request.query, retrieved_chunks, history, history_summary
+            )
+            if cached_response is not None:
+                response_data = {"response": cached_response, "model": settings.model_name, "cached": True}
         
-        # Retrieve relevant chunks using keyword matching
-        retrieved_chunks = self.langchain_service.retrieve_chunks(
-            query_request.query, 
-            max_chunks=query_request.max_chunks
+        if response_data is None:
+            # Logged with an empty response so shed traffic shows up in the query log and analytics
+            metadata["model"] = None
+            metadata["llm_cache_hit"] = False
+            metadata["degraded"] = True
+            metadata["degraded_reason"] = degraded_reason
+            self._log_query(query_request, "", metadata)
+            # The chunks are the whole answer, so they are returned even without include_sources
+            return QueryResponse(
+                query=query_request.query,
+                response="",
+                chunks=formatted_chunks,
+                processing_time=time.time() - start_time,
+                metadata=metadata
+            )
+        
+        metadata["model"] = response_data.get("model")
+        metadata["llm_cache_hit"] = response_data.get("cached", False)
+        self._log_query(query_request, response_data["response"], metadata)
+        
+        return QueryResponse(
+            query=query_request.query,
+            response=response_data["response"],
+            chunks=formatted_chunks if query_request.include_sources else None,
+            processing_time=time.time() - start_time,
+            metadata=metadata
+        )
+    
+    def _log_query(self, query_request: QueryRequest, response_text: str, metadata: Dict[str, Any]) -> None:
+        """Write an answered query to the query log on the log executor."""
+        logged = _query_log_executor.submit(
+            _save_query, query_request.query, response_text, metadata, query_request.session_id
         )
+        if query_request.session_id is not None:
+            logged.result()
+    
+    def _generate_before(
+        self,
+        controller: Optional[AdmissionController],
+        deadline: Optional[float],
+        query: str,
+        retrieved_chunks: List[Dict[str, Any]],
+        history: Optional[List[Dict[str, Any]]],
+        history_summary: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Generate a response, or return None if the deadline passed while waiting for an LLM slot."""
+        if deadline is not None and time.monotonic() >= deadline:
+            if controller is not None:
+                controller.record_expired()
+            return None
+        
+        started = time.monotonic()
+        response_data = self.langchain_service.generate_response(query, retrieved_chunks, history, history_summary)
+        if controller is not None:
+            controller.record("generation", time.monotonic() - started)
+        return response_data
+    
+    def _retrieve_from_session(
+        self,
+        query_request: QueryRequest,
+        turns: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Answer a follow-up from the chunks retrieved in earlier turns.
         
-        # Generate response using LangChain with context
-        response_data = self.langchain_service.generate_response(
-            query_request.query, 
-            context_chunks=retrieved_chunks
+        Returns None, meaning a full retrieval is needed, unless enough of the
+        warm chunks match the new query. Filtered queries always do a full retrieval.
+        """
+        if not turns or query_request.filters is not None:
+            return None
+        
+        chunk_ids = warm_chunk_ids(turns)
+        if len(chunk_ids) < query_request.max_chunks:
+            return None
+        
+        warm_chunks = get_retriever().get_chunks(self.db, chunk_ids)
+        ranked = self.langchain_service.rank_chunks(
+            query_request.query, warm_chunks, max_chunks=query_request.max_chunks
         )
+        if len(ranked) < query_request.max_chunks or any(c["relevance_score"] <= 0 for c in ranked):
+            return None
+        return ranked
+    
+    def process_batch(self, batch_request: BatchQueryRequest) -> Iterator[BatchQueryResult]:
+        """
+        Process a batch of queries, yielding each result as soon as it is ready.
         
-        # Format retrieved chunks for response
-        formatted_chunks = []
-        for chunk in retrieved_chunks:
-            formatted_chunks.append(
-                RetrievedChunk(
-                    chunk_id=chunk["chunk_id"],
-                    document_id=chunk["document_id"],
-                    content=chunk["content"],
-                    document_title=chunk.get("document_title"),
-                    document_source=chunk.get("document_source"),
-                    relevance_score=chunk.get("relevance_score")
-                )
+        Identical requests are answered once, retrieval for all distinct queries
+        runs in a single pass over the chunks, and LLM calls run concurrently
+        up to the batch's max_concurrency. Batch queries are stateless, so
+        session_id is ignored.
+        
+        Args:
+            batch_request (BatchQueryRequest): The batch of query requests
+            
+        Yields:
+            BatchQueryResult: The result for one request, tagged with its index in the batch
+        """
+        start_time = time.time()
+        
+        # Group identical requests so each is retrieved and generated only once
+        unique_requests: Dict[Tuple, List[int]] = {}
+        for index, query_request in enumerate(batch_request.queries):
+            key = (
+                query_request.query,
+                query_request.max_chunks,
+                query_request.include_sources,
+                query_request.include_chunk_content,
+                query_request.filters
             )
+            unique_requests.setdefault(key, []).append(index)
+        
+        requests = [batch_request.queries[indexes[0]] for indexes in unique_requests.values()]
+        
+        # Retrieve relevant chunks for all distinct queries at once, one pass per filter
+        queries_by_filters: Dict[Optional[QueryFilters], List[Tuple[str, int]]] = {}
+        for r in requests:
+            queries_by_filters.setdefault(r.filters, []).append((r.query, self._candidate_count(r)))
+        
+        candidates = {}
+        for filters, queries in queries_by_filters.items():
+            queries = list(dict.fromkeys(queries))
+            results = self.langchain_service.retrieve_chunks_batch(queries, filters=filters)
+            for (query, candidate_count), chunks in zip(queries, results):
+                candidates[(query, candidate_count, filters)] = chunks
+        
+        retrieved = {}
+        for r in requests:
+            key = (r.query, r.max_chunks, r.filters)
+            if key not in retrieved:
+                retrieved[key] = self._rerank(r, candidates[(r.query, self._candidate_count(r), r.filters)])[0]
+        
+        # Generate responses concurrently; the database session stays on this thread
+        with ThreadPoolExecutor(max_workers=batch_request.max_concurrency) as executor:
+            futures = {}
+            for query_request, indexes in zip(requests, unique_requests.values()):
+                retrieved_chunks = retrieved[
+                    (query_request.query, query_request.max_chunks, query_request.filters)
+                ]
+                future = executor.submit(
+                    self.langchain_service.generate_response,
+                    query_request.query,
+                    retrieved_chunks
+                )
+                futures[future] = (query_request, retrieved_chunks, indexes)
+            
+            for future in as_completed(futures):
+                query_request, retrieved_chunks, indexes = futures[future]
+                try:
+                    response = self._save_and_build_response(
+                        query_request, retrieved_chunks, future.result(), start_time
+                    )
+                    results = [BatchQueryResult(index=i, response=response) for i in indexes]
+                except Exception as e:
+                    results = [BatchQueryResult(index=i, error=str(e)) for i in indexes]
+                
+                for result in results:
+                    yield result
+    
+    def _save_and_build_response(
+        self,
+        query_request: QueryRequest,
+        retrieved_chunks: List[Dict[str, Any]],
+        response_data: Dict[str, Any],
+        start_time: float
+    ) -> QueryResponse:
+        """Save a generated answer to the database and build its response object."""
+        # Format retrieved chunks for response
+        formatted_chunks = self._format_chunks(retrieved_chunks, self._snippet_keywords(query_request))
         
         # Calculate total processing time
         processing_time = time.time() - start_time
@@ -59,7 +324,10 @@ class RAGService:
         metadata = {
             "model": response_data.get("model"),
             "chunks_retrieved": len(retrieved_chunks),
-            "retrieval_method": "keyword_matching"  # Updated to reflect new approach
+            "chunk_ids": [chunk["chunk_id"] for chunk in retrieved_chunks],
+            "retrieval_method": "keyword_matching",  # Updated to reflect new approach
+            "llm_cache_hit": response_data.get("cached", False),
+            **self._request_metadata(query_request)
         }
         
         # Save query and response to database
@@ -81,21 +349,163 @@ class RAGService:
         
         return response
     
-    def chunk_document(self, document_id: int, chunk_size: int = 500, overlap: int = 50) -> int:
+    @staticmethod
+    def _request_metadata(query_request: QueryRequest) -> Dict[str, Any]:
+        """Request options logged with a query, so it can be replayed to warm caches."""
+        filters = query_request.filters
+        return {
+            "max_chunks": query_request.max_chunks,
+            "filters": filters.model_dump(mode="json", exclude_none=True) if filters is not None else None
+        }
+    
+    def warm_caches(self, query_requests: List[QueryRequest], deadline: Optional[float] = None) -> Dict[str, int]:
+        """
+        Run stateless queries through retrieval and re-ranking without generating answers.
+        
+        Retrieval results land in the retrieval cache, index pages the queries
+        touch are read into memory, and answers another worker already paid
+        for are loaded from the shared LLM cache.
+        
+        Args:
+            query_requests (List[QueryRequest]): The queries to warm, most important first
+            deadline (Optional[float]): time.monotonic() value after which no more queries are started
+            
+        Returns:
+            Dict[str, int]: Numbers of queries retrieved and of answers found in the LLM cache
+        """
+        warmed = {"queries": 0, "responses_cached": 0}
+        queries_by_filters: Dict[Optional[QueryFilters], List[QueryRequest]] = {}
+        for r in query_requests:
+            queries_by_filters.setdefault(r.filters, []).append(r)
+        
+        for filters, requests in queries_by_filters.items():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            queries = [(r.query, self._candidate_count(r)) for r in requests]
+            results = self.langchain_service.retrieve_chunks_batch(list(dict.fromkeys(queries)), filters=filters)
+            candidates = dict(zip(dict.fromkeys(queries), results))
+            
+            for r, query in zip(requests, queries):
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                retrieved_chunks = self._rerank(r, candidates[query])[0]
+                warmed["queries"] += 1
+                if self.langchain_service.warm_response_cache(r.query, retrieved_chunks):
+                    warmed["responses_cached"] += 1
+        return warmed
+    
+    @staticmethod
+    def _candidate_count(query_request: QueryRequest) -> int:
+        """Number of first-stage candidates to retrieve for a query."""
+        if get_reranker() is None:
+            return query_request.max_chunks
+        return max(settings.rerank_candidates, query_request.max_chunks)
+    
+    def _rerank(
+        self,
+        query_request: QueryRequest,
+        candidates: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Re-rank first-stage candidates within the re-ranking budget.
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, Any]]: The best max_chunks
+            chunks and re-ranking details for the query metadata
+        """
+        reranker = get_reranker()
+        if reranker is None:
+            return candidates[:query_request.max_chunks], {}
+        
+        top, complete = reranker.rerank(
+            query_request.query,
+            self.langchain_service.extract_keywords(query_request.query),
+            candidates,
+            top_k=query_request.max_chunks,
+            budget_ms=settings.rerank_budget_ms
+        )
+        return top, {
+            "reranker": reranker.name,
+            "rerank_candidates": len(candidates),
+            "rerank_complete": complete
+        }
+    
+    def _snippet_keywords(self, query_request: QueryRequest) -> Optional[List[str]]:
+        """Keywords to highlight in snippets, or None when whole chunks are returned."""
+        if query_request.include_chunk_content:
+            return None
+        return self.langchain_service.extract_keywords(query_request.query)
+    
+    @staticmethod
+    def _format_chunks(
+        retrieved_chunks: List[Dict[str, Any]],
+        snippet_keywords: Optional[List[str]] = None
+    ) -> List[RetrievedChunk]:
+        """Format retrieved chunks for the response, as snippets if snippet_keywords is given."""
+        formatted_chunks = []
+        for chunk in retrieved_chunks:
+            content, snippet, highlights = chunk["content"], None, None
+            if snippet_keywords is not None:
+                # Offsets stored in the index spare a pass over the text
+                snippet, highlights = build_snippet(
+                    content, settings.snippet_max_chars, keywords=snippet_keywords, matches=chunk.get("matches")
+                )
+                content = None
+            formatted_chunks.append(
+                RetrievedChunk(
+                    chunk_id=chunk["chunk_id"],
+                    document_id=chunk["document_id"],
+                    content=content,
+                    document_title=chunk.get("document_title"),
+                    document_source=chunk.get("document_source"),
+                    relevance_score=chunk.get("relevance_score"),
+                    rerank_score=chunk.get("rerank_score"),
+                    snippet=snippet,
+                    highlights=highlights
+                )
+            )
+        return formatted_chunks
+    
+    def chunk_document(
+        self,
+        document_id: int,
+        strategy: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> Tuple[int, ChunkingStrategy]:
         """
         Chunk a document using LangChain text splitters and store the chunks in the database.
         
         Args:
             document_id (int): The document ID to chunk
-            chunk_size (int): The size of each chunk in characters
-            overlap (int): The overlap between chunks in characters
+            strategy (Optional[str]): Chunking strategy name; by default the one set for the document's type
+            chunk_size (Optional[int]): Override of the strategy's chunk size
+            overlap (Optional[int]): Override of the strategy's chunk overlap
             
         Returns:
-            int: The number of chunks created
+            Tuple[int, ChunkingStrategy]: The number of chunks created and the strategy used
         """
+        if strategy is not None:
+            chunking_strategy = get_strategy(strategy)
+        else:
+            document_type = DocumentRepository.get_document_type(self.db, document_id)
+            chunking_strategy = strategy_for_document_type(document_type)
+        chunking_strategy = chunking_strategy.with_sizes(chunk_size, overlap)
+        
         # Use LangChain service to process document
-        return self.langchain_service.process_document(
+        chunks_created = self.langchain_service.process_document(
             document_id=document_id,
-            chunk_size=chunk_size,
-            chunk_overlap=overlap
-        )
\ No newline at end of file
+            strategy=chunking_strategy
+        )
+        return chunks_created, chunking_strategy
+
+
+def _save_query(query_text: str, response_text: str, metadata: Dict[str, Any], session_id: Optional[str]) -> None:
+    """Save a query in a session of its own, logging failures instead of raising them."""
+    db = SessionLocal()
+    try:
+        ChunkRepository.save_query(db, query_text, response_text, metadata=metadata, session_id=session_id)
+    except Exception as e:
+        logger.warning("Could not log query %r: %s", query_text[:80], e)
+    finally:
+        db.close()
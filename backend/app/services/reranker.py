@@ -0,0 +1,216 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.services.snippets import Match, find_matches
+
+# Weights of the heuristic features; each feature is scaled to [0, 1]
+COVERAGE_WEIGHT = 0.4
+PROXIMITY_WEIGHT = 0.25
+PHRASE_WEIGHT = 0.2
+FIRST_STAGE_WEIGHT = 0.15
+
+# Span (in characters) over which all matched keywords count as fully close together
+PROXIMITY_SCALE_CHARS = 100
+
+# Longest gap between two keywords that still counts as a phrase
+PHRASE_GAP_CHARS = 3
+
+
+class BaseReranker(ABC):
+    """
+    Second-stage re-ranker for first-stage retrieval candidates.
+
+    Candidates are scored best first-stage first, in batches, until the
+    time budget runs out. Candidates left unscored keep their first-stage
+    order after the scored ones.
+    """
+
+    name = "base"
+
+    def __init__(self, batch_size: int):
+        """Initialize the re-ranker."""
+        self.batch_size = batch_size
+
+    def rerank(
+        self,
+        query: str,
+        keywords: List[str],
+        candidates: List[Dict[str, Any]],
+        top_k: int,
+        budget_ms: float
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Re-score candidates and keep the best.
+
+        Args:
+            query (str): The query text
+            keywords (List[str]): Keywords extracted from the query
+            candidates (List[Dict[str, Any]]): Retrieved chunks, best first
+            top_k (int): Number of chunks to keep
+            budget_ms (float): Time allowed for scoring, in milliseconds
+
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: The best chunks, each with a
+            rerank_score if it was scored, and whether every candidate was scored
+        """
+        deadline = time.monotonic() + budget_ms / 1000
+        scored: List[Tuple[float, int]] = []
+
+        for start in range(0, len(candidates), self.batch_size):
+            if time.monotonic() >= deadline:
+                break
+            batch = candidates[start:start + self.batch_size]
+            for offset, score in enumerate(self.score_batch(query, keywords, batch, candidates)):
+                scored.append((score, start + offset))
+
+        # Sort scored candidates by score, keeping first-stage order on ties
+        order = [i for _, i in sorted(scored, key=lambda pair: (-pair[0], pair[1]))]
+        order.extend(range(len(scored), len(candidates)))
+
+        scores = {i: score for score, i in scored}
+        top = []
+        for i in order[:top_k]:
+            chunk = dict(candidates[i])
+            if i in scores:
+                chunk["rerank_score"] = scores[i]
+            top.append(chunk)
+        return top, len(scored) == len(candidates)
+
+    @abstractmethod
+    def score_batch(
+        self,
+        query: str,
+        keywords: List[str],
+        batch: List[Dict[str, Any]],
+        candidates: List[Dict[str, Any]]
+    ) -> List[float]:
+        """Score a batch of candidates; higher is better."""
+
+
+class HeuristicReranker(BaseReranker):
+    """
+    Re-ranks with cheap lexical features: how many query keywords a chunk
+    contains, how close together they are, whether they appear as in the
+    query, and the first-stage score.
+    """
+
+    name = "heuristic"
+
+    def score_batch(
+        self,
+        query: str,
+        keywords: List[str],
+        batch: List[Dict[str, Any]],
+        candidates: List[Dict[str, Any]]
+    ) -> List[float]:
+        """Score a batch of candidates with the weighted features."""
+        distinct = list(dict.fromkeys(keywords))
+        top_score = max((c.get("relevance_score") or 0.0 for c in candidates), default=0.0)
+
+        scores = []
+        for chunk in batch:
+            # Offsets stored in the index spare a pass over the text
+            matches = chunk.get("matches")
+            if matches is None:
+                matches = find_matches(chunk["content"], distinct)
+
+            first_stage = (chunk.get("relevance_score") or 0.0) / top_score if top_score > 0 else 0.0
+            if not distinct:
+                scores.append(FIRST_STAGE_WEIGHT * first_stage)
+                continue
+
+            coverage = len({match[2] for match in matches}) / len(distinct)
+            scores.append(
+                COVERAGE_WEIGHT * coverage
+                + PROXIMITY_WEIGHT * _proximity(matches)
+                + PHRASE_WEIGHT * _phrase(matches, distinct)
+                + FIRST_STAGE_WEIGHT * first_stage
+            )
+        return scores
+
+
+class CrossEncoderReranker(BaseReranker):
+    """Re-ranks with a local cross-encoder model run on the CPU (needs sentence-transformers)."""
+
+    name = "cross_encoder"
+
+    def __init__(self, batch_size: int, model_name: str):
+        """Load the cross-encoder model."""
+        super().__init__(batch_size)
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise RuntimeError("The cross_encoder re-ranker needs the sentence-transformers package") from e
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score_batch(
+        self,
+        query: str,
+        keywords: List[str],
+        batch: List[Dict[str, Any]],
+        candidates: List[Dict[str, Any]]
+    ) -> List[float]:
+        """Score a batch of (query, chunk) pairs with the model."""
+        pairs = [(query, chunk["content"]) for chunk in batch]
+        return [float(score) for score in self.model.predict(pairs, batch_size=self.batch_size)]
+
+
+def _proximity(matches: Sequence[Match]) -> float:
+    """Closeness of the distinct keywords in a chunk, from the shortest span containing all of them."""
+    distinct = {match[2] for match in matches}
+    if len(distinct) < 2:
+        return 1.0 if distinct else 0.0
+
+    # Sliding window over matches in text order
+    best_span = None
+    counts: Dict[str, int] = {}
+    first = 0
+    for last, (_, end, term) in enumerate(matches):
+        counts[term] = counts.get(term, 0) + 1
+        while len(counts) == len(distinct):
+            span = end - matches[first][0]
+            if best_span is None or span < best_span:
+                best_span = span
+            first_term = matches[first][2]
+            counts[first_term] -= 1
+            if not counts[first_term]:
+                del counts[first_term]
+            first += 1
+
+    return 1 / (1 + math.log1p(best_span / PROXIMITY_SCALE_CHARS))
+
+
+def _phrase(matches: Sequence[Match], keywords: List[str]) -> float:
+    """Share of consecutive query keyword pairs that appear next to each other in the chunk."""
+    if len(keywords) < 2:
+        return 0.0
+    wanted = set(zip(keywords, keywords[1:]))
+    found = {
+        (a[2], b[2])
+        for a, b in zip(matches, matches[1:])
+        if (a[2], b[2]) in wanted and b[0] - a[1] <= PHRASE_GAP_CHARS
+    }
+    return len(found) / len(wanted)
+
+
+@lru_cache()
+def get_reranker() -> Optional[BaseReranker]:
+    """
+    Get the process-wide re-ranker chosen by RERANKER.
+
+    Returns:
+        Optional[BaseReranker]: The re-ranker, or None if re-ranking is disabled.
+    """
+    settings = get_settings()
+    reranker = settings.reranker.lower()
+    if reranker == "none":
+        return None
+    if reranker == "heuristic":
+        return HeuristicReranker(settings.rerank_batch_size)
+    if reranker == "cross_encoder":
+        return CrossEncoderReranker(settings.rerank_batch_size, settings.reranker_model)
+    raise ValueError(f"Unknown re-ranker: {settings.reranker}")
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.config import get_settings
+
+# Rough per-entry overhead (key tuple, dicts, floats) used for the memory bound
+ENTRY_OVERHEAD_BYTES = 256
+RESULT_BYTES = 64
+MATCH_BYTES = 48
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieval results, separate from the LLM response cache.
+
+    Maps a normalized keyword set, max_chunks and filters to the ranked chunk
+    IDs and scores, and the keyword offsets in each chunk when the backend
+    provides them. Entries record the generation of every document they
+    return and of the corpus as a whole; update_document, delete_document and
+    chunk inserts bump those generations so stale entries are never served.
+
+    Generations are tracked per process. Writes made through another worker
+    are only picked up once an entry's TTL expires.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        """Initialize an empty cache."""
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._document_generations: Dict[int, int] = {}
+        self._corpus_generation = 0
+        self._write_sequence = 0
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(keywords: List[str], max_chunks: int, filters: Optional[Hashable] = None) -> Hashable:
+        """Build the cache key; keyword order does not affect scoring, so it is ignored."""
+        return (tuple(sorted(keywords)), max_chunks, filters)
+
+    def get(self, key: Hashable) -> Optional[List[Tuple[int, float, Optional[list]]]]:
+        """Get the ranked (chunk_id, relevance_score, matches) entries for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_valid(entry):
+                if entry is not None:
+                    self._remove(key)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry["results"]
+
+    def write_sequence(self) -> int:
+        """Get a token to pass to put(), taken before the retrieval it caches runs."""
+        with self._lock:
+            return self._write_sequence
+
+    def put(
+        self,
+        key: Hashable,
+        results: List[Tuple[int, float, Optional[list]]],
+        document_ids: List[int],
+        write_sequence: int
+    ) -> None:
+        """
+        Store ranked results for a key.
+
+        The entry is dropped if any invalidation happened since write_sequence
+        was taken, since the retrieval may have read data from before it.
+        """
+        with self._lock:
+            if write_sequence != self._write_sequence:
+                return
+
+            self._remove(key)
+            entry = {
+                "results": results,
+                "expires_at": time.time() + self.ttl_seconds,
+                "corpus_generation": self._corpus_generation,
+                "document_generations": {
+                    document_id: self._document_generations.get(document_id, 0)
+                    for document_id in document_ids
+                },
+                "size": (
+                    ENTRY_OVERHEAD_BYTES
+                    + sum(RESULT_BYTES + MATCH_BYTES * len(matches or ()) for _, _, matches in results)
+                    + sum(len(k) for k in key[0])
+                )
+            }
+            self._entries[key] = entry
+            self._bytes += entry["size"]
+
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_document(self, document_id: int, corpus: bool = False) -> None:
+        """
+        Invalidate cached results that contain a document.
+
+        Pass corpus=True when the change can affect results that do not contain
+        the document, e.g. new chunks that may outrank cached ones.
+        """
+        with self._lock:
+            self._document_generations[document_id] = self._document_generations.get(document_id, 0) + 1
+            if corpus:
+                self._corpus_generation += 1
+            self._write_sequence += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit and size statistics for this process."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
+
+    def _is_valid(self, entry: Dict[str, Any]) -> bool:
+        """Check an entry's TTL and generations."""
+        if entry["expires_at"] <= time.time():
+            return False
+        if entry["corpus_generation"] != self._corpus_generation:
+            return False
+        return all(
+            self._document_generations.get(document_id, 0) == generation
+            for document_id, generation in entry["document_generations"].items()
+        )
+
+    def _remove(self, key: Hashable) -> None:
+        """Remove an entry if present."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+
+@lru_cache()
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Get the process-wide retrieval cache.
+
+    Returns:
+        Optional[RetrievalCache]: The cache, or None if caching is disabled.
+    """
+    settings = get_settings()
+    if not settings.retrieval_cache_enabled:
+        return None
+    return RetrievalCache(
+        max_bytes=settings.retrieval_cache_max_bytes,
+        ttl_seconds=settings.retrieval_cache_ttl_seconds
+    )
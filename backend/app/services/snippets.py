@@ -0,0 +1,127 @@
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from app.retrieval.base import iter_tokens
+
+# Marks text cut from either end of a snippet
+ELLIPSIS = "…"
+
+# (start, end, term) of a keyword occurrence in a chunk
+Match = Tuple[int, int, str]
+
+
+def find_matches(content: str, keywords: Iterable[str]) -> List[Match]:
+    """Find whole-word occurrences of the keywords in a chunk, in text order."""
+    keyword_set = set(keywords)
+    if not keyword_set:
+        return []
+    return [token for token in iter_tokens(content) if token[2] in keyword_set]
+
+
+def build_snippet(
+    content: str,
+    max_chars: int,
+    keywords: Optional[Iterable[str]] = None,
+    matches: Optional[Sequence[Match]] = None
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Cut the best-matching excerpt out of a chunk.
+
+    The excerpt is the window of at most max_chars that covers the most
+    distinct keywords, then the most occurrences, trimmed to word boundaries.
+
+    Args:
+        content (str): The chunk text
+        max_chars (int): Longest excerpt, not counting the ellipses
+        keywords (Optional[Iterable[str]]): Query keywords, used to scan the text when matches are not given
+        matches (Optional[Sequence[Match]]): Known keyword occurrences in text order, e.g. from the index
+
+    Returns:
+        Tuple[str, List[Tuple[int, int]]]: The excerpt and the (start, end)
+        offsets of the keyword occurrences within it
+    """
+    if matches is None:
+        matches = find_matches(content, keywords or ())
+
+    if len(content) <= max_chars:
+        return content, [(start, end) for start, end, _ in matches]
+
+    first, last = _best_window(matches, max_chars)
+    if first is None:
+        start, end = 0, max_chars
+    else:
+        # Center the covered matches in the window
+        span_start, span_end = matches[first][0], matches[last][1]
+        start = max(0, min(span_start - (max_chars - (span_end - span_start)) // 2, len(content) - max_chars))
+        end = start + max_chars
+
+    start, end = _snap_to_words(content, start, end, matches, first, last)
+    prefix = ELLIPSIS if start > 0 else ""
+    suffix = ELLIPSIS if end < len(content) else ""
+
+    highlights = [
+        (match_start - start + len(prefix), match_end - start + len(prefix))
+        for match_start, match_end, _ in matches
+        if match_start >= start and match_end <= end
+    ]
+    return prefix + content[start:end] + suffix, highlights
+
+
+def _best_window(matches: Sequence[Match], max_chars: int) -> Tuple[Optional[int], Optional[int]]:
+    """Indexes of the first and last match of the best window, or (None, None) without matches."""
+    best = None
+    best_score = (0, 0)
+    counts = {}
+    last = 0
+
+    for first in range(len(matches)):
+        # Grow the window while it still fits
+        while last < len(matches) and matches[last][1] - matches[first][0] <= max_chars:
+            counts[matches[last][2]] = counts.get(matches[last][2], 0) + 1
+            last += 1
+
+        if last > first:
+            score = (len(counts), last - first)
+            if score > best_score:
+                best, best_score = (first, last - 1), score
+
+        # Slide the window past the first match
+        if last > first:
+            term = matches[first][2]
+            counts[term] -= 1
+            if not counts[term]:
+                del counts[term]
+        else:
+            last = first + 1
+
+    return best if best is not None else (None, None)
+
+
+def _snap_to_words(
+    content: str,
+    start: int,
+    end: int,
+    matches: Sequence[Match],
+    first: Optional[int],
+    last: Optional[int]
+) -> Tuple[int, int]:
+    """Move the window edges inward so no word is cut, without dropping the covered matches."""
+    start_limit = matches[first][0] if first is not None else end
+    end_limit = matches[last][1] if last is not None else start
+
+    if start > 0 and content[start - 1].isalnum() and content[start].isalnum():
+        boundary = start
+        while boundary < start_limit and not content[boundary].isspace():
+            boundary += 1
+        start = boundary
+    while start < start_limit and content[start].isspace():
+        start += 1
+
+    if end < len(content) and content[end - 1].isalnum() and content[end].isalnum():
+        boundary = end
+        while boundary > end_limit and not content[boundary - 1].isspace():
+            boundary -= 1
+        end = boundary
+    while end > end_limit and content[end - 1].isspace():
+        end -= 1
+
+    return start, end
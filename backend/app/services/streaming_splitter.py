@@ -0,0 +1,171 @@
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+class StreamingTextSplitter:
+    """
+    Memory-bounded version of RecursiveCharacterTextSplitter.
+
+    Text is consumed as an iterable of windows and chunks are yielded as soon
+    as they are complete, so only the current top-level piece (e.g. one
+    paragraph) and the chunk being merged are held in memory. The output is
+    identical to RecursiveCharacterTextSplitter.split_text on the full text.
+
+    Memory is bounded by the largest top-level piece, not by the window size.
+    A piece too large for one chunk is split in memory with the remaining
+    separators, because the wrapped splitter picks the separator for it from
+    its whole text. A document without its top-level separator is therefore
+    held in memory whole.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        length_function: Callable[[str], int] = len,
+        separators: Optional[List[str]] = None,
+        keep_separator: str = "start"
+    ):
+        """
+        Initialize the streaming splitter; separators must be literal strings.
+
+        keep_separator is "start" to begin each split with the separator before
+        it, or "end" to end each split with the separator after it, as suits
+        punctuation.
+        """
+        self._splitter = RecursiveCharacterTextSplitter(
+            separators=separators,
+            keep_separator=keep_separator,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=length_function
+        )
+        self._keep_separator = keep_separator
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._length_function = length_function
+
+    @property
+    def separators(self) -> List[str]:
+        """The separators tried, in order, by the wrapped splitter."""
+        return self._splitter._separators
+
+    def choose_separator(self, contains: Callable[[str], bool]) -> Tuple[str, List[str]]:
+        """
+        Choose the top-level separator the same way the wrapped splitter does.
+
+        Args:
+            contains (Callable[[str], bool]): Tells whether the full text contains a separator
+
+        Returns:
+            Tuple[str, List[str]]: The separator and the separators left for recursive splits
+        """
+        separators = self.separators
+        for i, separator in enumerate(separators):
+            if separator == "":
+                return separator, []
+            if contains(separator):
+                return separator, separators[i + 1:]
+        return separators[-1], []
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text held in memory, e.g. for benchmarks."""
+        separator, new_separators = self.choose_separator(lambda candidate: candidate in text)
+        return list(self.split_windows([text], separator, new_separators))
+
+    def split_windows(self, windows: Iterable[str], separator: str, new_separators: List[str]) -> Iterator[str]:
+        """
+        Split text arriving in windows into chunks.
+
+        Each top-level piece is buffered until the separator after it arrives,
+        and oversized pieces are split in memory; see the class docstring.
+
+        Args:
+            windows (Iterable[str]): Consecutive pieces of the text
+            separator (str): Top-level separator from choose_separator
+            new_separators (List[str]): Remaining separators from choose_separator
+
+        Yields:
+            str: The chunks, in document order
+        """
+        # Port of TextSplitter._merge_splits that keeps its state between splits.
+        # Separators are kept with the splits, so splits join with "".
+        current_doc: Deque[str] = deque()
+        total = 0
+
+        for split in self._iter_splits(windows, separator, self._keep_separator):
+            split_len = self._length_function(split)
+
+            if split_len >= self._chunk_size:
+                # Oversized splits end the current merge run and are split recursively
+                if current_doc:
+                    doc = self._splitter._join_docs(list(current_doc), "")
+                    if doc is not None:
+                        yield doc
+                    current_doc.clear()
+                    total = 0
+                if new_separators:
+                    yield from self._splitter._split_text(split, new_separators)
+                else:
+                    yield split
+                continue
+
+            if total + split_len > self._chunk_size:
+                if current_doc:
+                    doc = self._splitter._join_docs(list(current_doc), "")
+                    if doc is not None:
+                        yield doc
+                    # Drop leading splits until only the overlap remains
+                    while total > self._chunk_overlap or (
+                        total + split_len > self._chunk_size and total > 0
+                    ):
+                        total -= self._length_function(current_doc.popleft())
+            current_doc.append(split)
+            total += split_len
+
+        if current_doc:
+            doc = self._splitter._join_docs(list(current_doc), "")
+            if doc is not None:
+                yield doc
+
+    @staticmethod
+    def _iter_splits(windows: Iterable[str], separator: str, keep_separator: str = "start") -> Iterator[str]:
+        """Yield the top-level splits of the text, each starting or ending with its separator."""
+        if not separator:
+            for window in windows:
+                yield from window
+            return
+
+        separator_len = len(separator)
+        # Splits are cut before each separator, or after it when kept at the end
+        cut_offset = separator_len if keep_separator == "end" else 0
+        buffer = ""
+        search_from = 0
+
+        for window in windows:
+            buffer += window
+
+            # Scan left to right for non-overlapping matches, like re.split
+            cuts = []
+            position = buffer.find(separator, search_from)
+            while position != -1:
+                cuts.append(position + cut_offset)
+                position = buffer.find(separator, position + separator_len)
+
+            if not cuts:
+                search_from = max(search_from, len(buffer) - separator_len + 1)
+                continue
+
+            # Every piece before the last cut is complete
+            boundaries = [0] + cuts
+            for begin, end in zip(boundaries, cuts):
+                if end > begin:
+                    yield buffer[begin:end]
+
+            buffer = buffer[cuts[-1]:]
+            # A separator kept at the start of the buffer was already matched
+            search_from = max(separator_len - cut_offset, len(buffer) - separator_len + 1)
+
+        if buffer:
+            yield buffer
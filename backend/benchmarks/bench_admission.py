@@ -0,0 +1,146 @@
+"""
+Measure goodput of /api/query under overload with and without admission control.
+
+Queries arrive open-loop (Poisson) at --load times what the LLM slots can
+serve, and go through the same stages as the route: the admission decision
+on arrival, retrieval on a request thread (memory backend), then generation
+on an executor with --concurrency slots backed by the fake LLM. Goodput
+counts generated answers delivered within --deadline-ms, per second;
+degraded (chunks only) and rejected requests are reported separately.
+
+Without admission control every request waits for an LLM slot, so under
+sustained overload the queue grows until nearly every answer is late.
+
+Usage (from backend/):
+    python -m benchmarks.bench_admission --load 1.5 3 --deadline-ms 2000
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import HumanMessage
+
+from app.retrieval.memory import InMemoryRetriever
+from app.services.admission import AdmissionController
+from app.services.fake_llm import FakeChatModel
+from benchmarks.bench_retrievers import make_corpus, make_queries
+
+# Threads serving requests, like the threadpool the route runs queries on
+REQUEST_THREADS = 40
+
+
+def run(
+    retriever: InMemoryRetriever,
+    queries: List[List[str]],
+    args: argparse.Namespace,
+    load: float,
+    controller: Optional[AdmissionController]
+) -> Dict[str, Any]:
+    """Send queries at load times the LLM capacity for args.duration seconds and tally the outcomes."""
+    llm = FakeChatModel(args.llm_latency_ms)
+    capacity = args.concurrency / (args.llm_latency_ms / 1000)
+    rng = random.Random(args.seed)
+    lock = threading.Lock()
+    outcomes: Dict[str, int] = {"good": 0, "late": 0, "degraded": 0, "rejected": 0, "expired": 0}
+    good_latencies: List[float] = []
+
+    def generate(question: str, deadline: float) -> Optional[str]:
+        if controller is not None and time.monotonic() >= deadline:
+            controller.record_expired()
+            return None
+        started = time.monotonic()
+        answer = llm.invoke([HumanMessage(content=f"Question: {question}\n\nAnswer:")]).content
+        if controller is not None:
+            controller.record("generation", time.monotonic() - started)
+        return answer
+
+    def serve(keywords: List[str], arrived: float, deadline: float, admission: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        retriever.search(None, [(keywords, 5)])
+        if controller is not None:
+            controller.record("retrieval", time.monotonic() - started)
+
+        outcome = "degraded"
+        if admission["decision"] == "admit":
+            answer = llm_pool.submit(generate, " ".join(keywords), deadline).result()
+            if controller is not None:
+                controller.release(admission)
+            latency = time.monotonic() - arrived
+            if answer is None:
+                outcome = "expired"
+            elif latency <= args.deadline_ms / 1000:
+                outcome = "good"
+                with lock:
+                    good_latencies.append(latency)
+            else:
+                outcome = "late"
+        with lock:
+            outcomes[outcome] += 1
+
+    with ThreadPoolExecutor(args.concurrency) as llm_pool, ThreadPoolExecutor(REQUEST_THREADS) as request_pool:
+        started = time.monotonic()
+        next_arrival = started
+        sent = 0
+        while next_arrival - started < args.duration:
+            time.sleep(max(0.0, next_arrival - time.monotonic()))
+            arrived = time.monotonic()
+            keywords = queries[sent % len(queries)]
+            sent += 1
+            admission = {"decision": "admit"}
+            if controller is not None:
+                admission = controller.admit(args.deadline_ms, allow_degraded=not args.no_degraded)
+                if admission["decision"] == "reject":
+                    outcomes["rejected"] += 1
+                    next_arrival += rng.expovariate(capacity * load)
+                    continue
+            request_pool.submit(serve, keywords, arrived, arrived + args.deadline_ms / 1000, admission)
+            next_arrival += rng.expovariate(capacity * load)
+        elapsed = time.monotonic() - started
+
+    return {
+        "sent": sent,
+        **outcomes,
+        "goodput": outcomes["good"] / elapsed,
+        "p50": statistics.median(good_latencies) * 1000 if good_latencies else 0.0,
+        "p99": statistics.quantiles(good_latencies, n=100)[98] * 1000 if len(good_latencies) > 1 else 0.0
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load", type=float, nargs="+", default=[0.8, 1.5, 3.0],
+                        help="Arrival rate as a multiple of LLM capacity")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM slots")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--deadline-ms", type=float, default=1000)
+    parser.add_argument("--degrade-depth", type=int, default=32, help="LLM_QUEUE_DEGRADE_DEPTH")
+    parser.add_argument("--no-degraded", action="store_true", help="Reject instead of degrading, as with allow_degraded=false")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of arrivals per run")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = make_corpus(args.chunks, vocabulary_size=5000, seed=args.seed)
+    retriever = InMemoryRetriever()
+    retriever.rebuild(rows)
+    queries = make_queries(rows, 500, seed=args.seed)
+
+    capacity = args.concurrency / (args.llm_latency_ms / 1000)
+    print(f"LLM capacity {capacity:.0f} answers/s, deadline {args.deadline_ms:.0f} ms")
+    print(f"{'load':>5} {'admission':>9} {'sent':>6} {'good':>6} {'late':>6} {'expired':>7} "
+          f"{'degraded':>8} {'rejected':>8} {'goodput/s':>9} {'p50 ms':>7} {'p99 ms':>7}")
+    for load in args.load:
+        for enabled in (False, True):
+            controller = AdmissionController(args.concurrency, args.degrade_depth) if enabled else None
+            result = run(retriever, queries, args, load, controller)
+            print(f"{load:>5.1f} {'on' if enabled else 'off':>9} {result['sent']:>6} {result['good']:>6} "
+                  f"{result['late']:>6} {result['expired']:>7} {result['degraded']:>8} {result['rejected']:>8} "
+                  f"{result['goodput']:>9.1f} {result['p50']:>7.0f} {result['p99']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
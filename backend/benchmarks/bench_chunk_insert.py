@@ -0,0 +1,113 @@
+"""
+Compare per-row and multi-row inserts into the Chunks table.
+
+"executemany" is the previous create_chunks_batch path: pymssql's
+executemany, which sends one INSERT per row. "values" is the multi-row
+INSERT ... VALUES ... OUTPUT path create_chunks_batch now uses, which also
+returns the new chunk_ids. Both insert CHUNK_INSERT_BATCH_SIZE rows per
+call and commit after each call, like document processing does.
+
+Rows reference a single scratch chunk body so only the Chunks insert is
+measured. --end-to-end also times create_chunks_batch with distinct bodies,
+which adds the ChunkContents lookups and inserts. The scratch document and
+everything it references are deleted afterwards.
+
+Needs the SQL Server configured in .env. Usage (from backend/):
+    python -m benchmarks.bench_chunk_insert --counts 10000 100000 1000000
+"""
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database.connection import SessionLocal
+from app.database.repository import CHUNK_INSERT_COLUMNS, ChunkRepository, DocumentRepository, _bulk_insert
+from app.models.models import Chunk, Document
+
+
+def insert_executemany(db: Session, rows: List[Tuple[int, int, int]]) -> None:
+    """The previous path: executemany on the raw DBAPI cursor."""
+    cursor = db.connection().connection.cursor()
+    cursor.executemany("INSERT INTO Chunks (document_id, content_id, chunk_order) VALUES (%s, %s, %s)", rows)
+    db.commit()
+
+
+def insert_values(db: Session, rows: List[Tuple[int, int, int]]) -> None:
+    """The new path: multi-row VALUES statements returning chunk_ids."""
+    _bulk_insert(db, "Chunks", CHUNK_INSERT_COLUMNS, [dict(zip(CHUNK_INSERT_COLUMNS, row)) for row in rows], ("chunk_id",))
+    db.commit()
+
+
+def timed(label: str, count: int, batch_size: int, make_batch: Callable[[int, int], object], insert) -> None:
+    """Insert count rows in batches and print the throughput."""
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        insert(make_batch(start, min(batch_size, count - start)))
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<12} {count:>9} rows {elapsed:9.2f} s {count / elapsed:10.0f} rows/s")
+
+
+def create_scratch_document(db: Session) -> Tuple[int, int]:
+    """Create the scratch document and the chunk body its rows reference."""
+    document_id = DocumentRepository.create_document(
+        db, Document(title="bench_chunk_insert scratch", content="scratch", document_type="benchmark")
+    )["document_id"]
+    content_id = ChunkRepository._get_or_create_contents(db, [f"bench_chunk_insert scratch {document_id}"])[0]
+    # Referenced once here so delete_document removes the body along with the document
+    db.execute(
+        text("INSERT INTO Chunks (document_id, content_id, chunk_order) VALUES (:document_id, :content_id, 0)"),
+        {"document_id": document_id, "content_id": content_id}
+    )
+    db.commit()
+    return document_id, content_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--batch-size", type=int, default=get_settings().chunk_insert_batch_size)
+    parser.add_argument("--end-to-end", action="store_true", help="Also time create_chunks_batch with distinct bodies")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    document_id, content_id = create_scratch_document(db)
+
+    def make_rows(start: int, size: int) -> List[Tuple[int, int, int]]:
+        return [(document_id, content_id, start + i + 1) for i in range(size)]
+
+    def make_chunks(start: int, size: int) -> List[Chunk]:
+        return [
+            Chunk(document_id=document_id, content=f"bench_chunk_insert body {start + i} " * 8, chunk_order=start + i + 1)
+            for i in range(size)
+        ]
+
+    def clear_rows() -> None:
+        db.execute(
+            text("DELETE FROM Chunks WHERE document_id = :document_id AND chunk_order > 0"),
+            {"document_id": document_id}
+        )
+        db.commit()
+
+    print(f"batches of {args.batch_size} rows")
+    try:
+        for count in args.counts:
+            timed("executemany", count, args.batch_size, make_rows, lambda rows: insert_executemany(db, rows))
+            clear_rows()
+            timed("values", count, args.batch_size, make_rows, lambda rows: insert_values(db, rows))
+            clear_rows()
+            if args.end_to_end:
+                timed("end-to-end", count, args.batch_size, make_chunks,
+                      lambda chunks: ChunkRepository.create_chunks_batch(db, chunks))
+                # Start over so the distinct bodies are deleted too
+                DocumentRepository.delete_document(db, document_id)
+                document_id, content_id = create_scratch_document(db)
+    finally:
+        DocumentRepository.delete_document(db, document_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
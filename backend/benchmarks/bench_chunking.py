@@ -0,0 +1,139 @@
+"""
+Compare chunking strategies on a labeled sample set.
+
+Every strategy chunks the same markdown, code and FAQ documents, which are
+then indexed with the sqlite_fts backend and queried with the application's
+keyword extraction. A question is answered at rank r when the r-th chunk
+retrieved contains its whole answer. The "adaptive" row picks the strategy
+from each document's type, as POST /documents/{id}/process does.
+
+Chunks are first checked against LangChain's splitter, and for chunks that
+begin with a punctuation separator cut from the previous sentence.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chunking --documents 20 --max-chunks 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.retrieval.sqlite_fts import SqliteFtsRetriever
+from app.services.chunking import (
+    STRATEGIES, ChunkingStrategy, TokenizerUnavailableError, load_encoding, strategy_for_document_type, token_length
+)
+from app.services.conversation import estimate_tokens
+from app.services.langchain_service import _extract_keywords_cached
+from benchmarks.chunking_samples import make_samples
+
+
+def chunk_documents(documents: List[Dict[str, Any]], strategy: Optional[ChunkingStrategy]) -> List[Dict[str, Any]]:
+    """Split every document into index rows; a strategy of None picks one per document type."""
+    rows = []
+    for document in documents:
+        chosen = strategy or strategy_for_document_type(document["document_type"])
+        chunks = chosen.make_splitter().split_text(document["content"])
+        check_chunks(chosen, document["content"], chunks)
+        for order, content in enumerate(chunks, start=1):
+            chunk_id = len(rows) + 1
+            rows.append({
+                "chunk_id": chunk_id,
+                "document_id": document["document_id"],
+                "content": content,
+                "chunk_order": order,
+                "cluster_id": chunk_id,
+                "document_title": f"Document {document['document_id']}",
+                "document_source": "samples",
+                "document_type": document["document_type"],
+                "created_at": None
+            })
+    return rows
+
+
+def check_chunks(strategy: ChunkingStrategy, text: str, chunks: List[str]) -> None:
+    """
+    Check a document's chunks against LangChain's splitter and for leading separators.
+
+    Raises:
+        AssertionError: If the chunks differ, or one starts with punctuation
+    """
+    splitter = strategy.make_splitter()
+    expected = splitter._splitter.split_text(text)
+    assert chunks == expected, f"{strategy.name}: streaming chunks differ from LangChain's splitter"
+    punctuation = [separator.strip() for separator in strategy.separators if separator.strip()]
+    if strategy.keep_separator == "end":
+        for chunk in chunks:
+            assert not chunk.startswith(tuple(punctuation)), f"{strategy.name}: chunk starts with a separator: {chunk[:40]!r}"
+
+
+def evaluate(
+    label: str,
+    rows: List[Dict[str, Any]],
+    questions: List[Dict[str, Any]],
+    max_chunks: int,
+    count_tokens: Callable[[str], int]
+) -> None:
+    """Index the chunks, answer every question and print one result row."""
+    index_path = os.path.join(tempfile.mkdtemp(), "bench_chunking.sqlite3")
+    retriever = SqliteFtsRetriever(index_path)
+    retriever.rebuild(rows)
+    # The index is in WAL mode, so recent pages may not be in the main file yet
+    index_bytes = sum(os.path.getsize(path) for path in (index_path, index_path + "-wal") if os.path.exists(path))
+
+    hits = 0
+    reciprocal_ranks = []
+    prompt_chars = []
+    started = time.perf_counter()
+    for question in questions:
+        keywords = list(_extract_keywords_cached(question["query"]))
+        chunks = retriever.search(None, [(keywords, max_chunks)])[0][0]
+        answer = question["answer"].lower()
+        rank = next((i for i, chunk in enumerate(chunks, start=1) if answer in chunk["content"].lower()), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        prompt_chars.append(sum(len(chunk["content"]) for chunk in chunks))
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(questions)
+    retriever.close()
+
+    sizes = [len(row["content"]) for row in rows]
+    print(
+        f"  {label:<10} {len(rows):7d} {statistics.mean(sizes):9.0f} "
+        f"{statistics.mean(count_tokens(row['content']) for row in rows):8.0f} {index_bytes / 1e6:8.2f} "
+        f"{hits / len(questions):7.3f} {statistics.mean(reciprocal_ranks):6.3f} "
+        f"{statistics.mean(prompt_chars):9.0f} {elapsed_ms:8.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20, help="Documents of each type")
+    parser.add_argument("--max-chunks", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    documents, questions = make_samples(args.documents, args.seed)
+    print(f"{len(documents)} documents, {len(questions)} questions, top {args.max_chunks}")
+    print(
+        f"  {'strategy':<10} {'chunks':>7} {'avg chars':>9} {'avg tok':>8} {'index MB':>8} "
+        f"{'hit@' + str(args.max_chunks):>7} {'MRR':>6} {'prompt ch':>9} {'query ms':>8}"
+    )
+
+    # Without the tokenizer the token strategy is skipped and token counts are estimated
+    count_tokens: Callable[[str], int] = token_length
+    try:
+        load_encoding()
+    except TokenizerUnavailableError as e:
+        print(f"  Skipping the token strategy, avg tok is estimated: {e}")
+        count_tokens = estimate_tokens
+
+    for name, strategy in STRATEGIES.items():
+        if strategy.length_unit == "tokens" and count_tokens is not token_length:
+            continue
+        evaluate(name, chunk_documents(documents, strategy), questions, args.max_chunks, count_tokens)
+    evaluate("adaptive", chunk_documents(documents, None), questions, args.max_chunks, count_tokens)
+
+
+if __name__ == "__main__":
+    main()
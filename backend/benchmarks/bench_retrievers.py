@@ -0,0 +1,119 @@
+"""
+Compare retrieval backends on a synthetic corpus.
+
+The sqlserver figures cover only the Python scoring pass over rows already
+fetched, so they are a lower bound for that backend; the index-based
+backends answer from their own index and need no database at all.
+
+Usage (from backend/):
+    python -m benchmarks.bench_retrievers --chunks 20000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from app.models.models import QueryFilters
+from app.retrieval.base import calculate_keyword_score, select_top, tokenize
+from app.retrieval.memory import InMemoryRetriever
+from app.retrieval.sqlite_fts import SqliteFtsRetriever
+
+DOCUMENT_TYPES = ["manual", "policy", "faq", "report"]
+SOURCES = ["wiki", "sharepoint", "upload"]
+
+
+def make_corpus(chunk_count: int, vocabulary_size: int, seed: int) -> List[Dict[str, Any]]:
+    """Build chunk rows with Zipf-like word frequencies."""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    start = datetime(2024, 1, 1)
+
+    rows = []
+    for chunk_id in range(1, chunk_count + 1):
+        document_id = (chunk_id - 1) // 20 + 1
+        words = rng.choices(vocabulary, weights=weights, k=rng.randint(40, 90))
+        rows.append({
+            "chunk_id": chunk_id,
+            "document_id": document_id,
+            "content": " ".join(words),
+            "chunk_order": (chunk_id - 1) % 20 + 1,
+            "cluster_id": chunk_id,
+            "document_title": f"Document {document_id}",
+            "document_source": SOURCES[document_id % len(SOURCES)],
+            "document_type": DOCUMENT_TYPES[document_id % len(DOCUMENT_TYPES)],
+            "created_at": start + timedelta(hours=document_id)
+        })
+    return rows
+
+
+def make_queries(rows: List[Dict[str, Any]], query_count: int, seed: int) -> List[List[str]]:
+    """Sample query keywords from the corpus so most queries have matches."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(query_count):
+        words = tokenize(rng.choice(rows)["content"])
+        queries.append(rng.sample(words, k=min(3, len(words))))
+    return queries
+
+
+def scan_search(rows: List[Dict[str, Any]], keywords: List[str], max_chunks: int, filters) -> List[Dict[str, Any]]:
+    """The sqlserver backend's scoring pass, over rows already in memory."""
+    candidates = rows
+    if filters is not None and filters.document_type is not None:
+        candidates = [row for row in rows if row["document_type"] == filters.document_type]
+    scores = [calculate_keyword_score(row["content"].lower(), keywords) for row in candidates]
+    return select_top(candidates, scores, max_chunks)
+
+
+def timed(label: str, search, queries: List[List[str]]) -> None:
+    """Run every query once and print latency percentiles."""
+    latencies = []
+    for keywords in queries:
+        started = time.perf_counter()
+        search(keywords)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:<12} mean {statistics.mean(latencies):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-chunks", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = make_corpus(args.chunks, args.vocabulary, args.seed)
+    queries = make_queries(rows, args.queries, args.seed)
+    print(f"{len(rows)} chunks, {len(queries)} queries, top {args.max_chunks}")
+
+    memory = InMemoryRetriever()
+    started = time.perf_counter()
+    memory.rebuild(rows)
+    print(f"memory index built in {time.perf_counter() - started:.2f} s")
+
+    index_path = os.path.join(tempfile.mkdtemp(), "bench_fts.sqlite3")
+    fts = SqliteFtsRetriever(index_path)
+    started = time.perf_counter()
+    fts.rebuild(rows)
+    print(f"sqlite_fts index built in {time.perf_counter() - started:.2f} s ({os.path.getsize(index_path) / 1e6:.1f} MB)")
+
+    for filters in (None, QueryFilters(document_type="policy")):
+        print(f"filters: {filters}")
+        timed("sqlserver", lambda k: scan_search(rows, k, args.max_chunks, filters), queries)
+        timed("memory", lambda k: memory.search(None, [(k, args.max_chunks)], filters), queries)
+        timed("sqlite_fts", lambda k: fts.search(None, [(k, args.max_chunks)], filters), queries)
+
+    fts.close()
+
+
+if __name__ == "__main__":
+    main()
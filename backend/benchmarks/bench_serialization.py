@@ -0,0 +1,163 @@
+"""
+Measure serialization CPU and bytes on the wire for listing and query responses.
+
+Compares FastAPI's default path (response_model validation, jsonable_encoder
+and json.dumps) with the lean path used by the API (orjson for rows, compiled
+Pydantic serializers for models), full chunks with snippets, and gzip.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --documents 500 --requests 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+
+from app.models.models import QueryResponse, RetrievedChunk
+from app.routes.responses import RowsJSONResponse, SelectiveGZipMiddleware, chunk_fields_excluded, model_response
+from app.services.snippets import build_snippet
+
+WORDS = ["retrieval", "augmented", "generation", "chunk", "document", "query", "index", "latency", "the", "of"]
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_documents(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "document_id": i,
+            "title": f"Document {i}",
+            "content": make_text(rng, 800),
+            "source": "wiki",
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": start + timedelta(minutes=i),
+            "document_type": "manual"
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def make_query_response(chunk_count: int, snippets: bool, rng: random.Random) -> QueryResponse:
+    keywords = ["retrieval", "latency"]
+    chunks = []
+    for i in range(chunk_count):
+        content = make_text(rng, 90)
+        snippet, highlights = build_snippet(content, 240, keywords=keywords) if snippets else (None, None)
+        chunks.append(RetrievedChunk(
+            chunk_id=i, document_id=i, content=None if snippets else content,
+            document_title=f"Document {i}", document_source="wiki", relevance_score=1.5,
+            snippet=snippet, highlights=highlights
+        ))
+    return QueryResponse(
+        query="how is retrieval latency measured", response=make_text(rng, 200),
+        chunks=chunks, processing_time=1.2, metadata={"model": "gpt-4o-mini", "chunks_retrieved": chunk_count}
+    )
+
+
+def build_app(
+    documents: List[Dict[str, Any]],
+    full: QueryResponse,
+    snippet: QueryResponse,
+    compress_level: int
+) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=compress_level)
+
+    @app.get("/default/documents", response_model=List[Dict[str, Any]])
+    def default_documents():
+        return documents
+
+    @app.get("/lean/documents", response_model=List[Dict[str, Any]])
+    def lean_documents():
+        return RowsJSONResponse(documents)
+
+    @app.get("/lean/documents-metadata", response_model=List[Dict[str, Any]])
+    def lean_documents_metadata():
+        return RowsJSONResponse([{k: v for k, v in d.items() if k != "content"} for d in documents])
+
+    @app.get("/default/query", response_model=QueryResponse)
+    def default_query():
+        return full
+
+    @app.get("/lean/query", response_model=QueryResponse)
+    def lean_query():
+        return model_response(full, exclude={"chunks": {"__all__": chunk_fields_excluded(True)}})
+
+    @app.get("/lean/query-snippets", response_model=QueryResponse)
+    def lean_query_snippets():
+        return model_response(snippet, exclude={"chunks": {"__all__": chunk_fields_excluded(False)}})
+
+    return app
+
+
+async def get(app: FastAPI, path: str, accept_encoding: str) -> int:
+    """Send a GET straight to the ASGI app and return the size of the body sent."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80)
+    }
+    body_size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal body_size
+        if message["type"] == "http.response.body":
+            body_size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return body_size
+
+
+def measure(app: FastAPI, path: str, requests: int, gzip: bool) -> None:
+    loop = asyncio.new_event_loop()
+    wire_bytes = 0
+    started = time.process_time()
+    for _ in range(requests):
+        wire_bytes = loop.run_until_complete(get(app, path, "gzip" if gzip else "identity"))
+    loop.close()
+    cpu_ms = (time.process_time() - started) * 1000 / requests
+    label = f"{path}{' (gzip)' if gzip else ''}"
+    print(f"  {label:<40} {cpu_ms:8.2f} ms CPU/request {wire_bytes / 1024:10.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--compress-level", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = build_app(
+        make_documents(args.documents, rng),
+        make_query_response(args.chunks, snippets=False, rng=rng),
+        make_query_response(args.chunks, snippets=True, rng=rng),
+        args.compress_level
+    )
+
+    print(f"listing of {args.documents} documents")
+    for path in ("/default/documents", "/lean/documents", "/lean/documents-metadata"):
+        measure(app, path, args.requests, gzip=False)
+    measure(app, "/lean/documents", args.requests, gzip=True)
+
+    print(f"query response with {args.chunks} chunks")
+    for path in ("/default/query", "/lean/query", "/lean/query-snippets"):
+        measure(app, path, args.requests, gzip=False)
+    measure(app, "/lean/query-snippets", args.requests, gzip=True)
+
+
+if __name__ == "__main__":
+    main()
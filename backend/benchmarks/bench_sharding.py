@@ -0,0 +1,109 @@
+"""
+Run a sharded chunk index on one machine and check it against a single index.
+
+Starts --shards shard server processes on local ports, indexes a synthetic
+corpus through the coordinator, then checks that every query returns the same
+chunks and scores as one in-memory index (global IDF makes the merge exact)
+and reports latency. Finally one shard is paused with SIGSTOP to show the
+coordinator answering from the remaining shards within the timeout.
+
+Usage (from backend/, Linux):
+    python -m benchmarks.bench_sharding --shards 4 --chunks 50000
+"""
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.retrieval.memory import InMemoryRetriever
+from app.retrieval.sharded import ShardedRetriever
+from benchmarks.bench_retrievers import make_corpus, make_queries, timed
+
+
+def start_shards(count: int, base_port: int) -> list:
+    """Start shard server processes and wait until they answer."""
+    processes = []
+    for i in range(count):
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "app.retrieval.shard_server", "--port", str(base_port + i)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ))
+
+    for i in range(count):
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{base_port + i}/health", timeout=1.0)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f"Shard on port {base_port + i} did not start")
+    return processes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--base-port", type=int, default=8101)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-chunks", type=int, default=5)
+    parser.add_argument("--timeout-ms", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = make_corpus(args.chunks, args.vocabulary, args.seed)
+    queries = make_queries(rows, args.queries, args.seed)
+
+    processes = start_shards(args.shards, args.base_port)
+    try:
+        urls = [f"http://127.0.0.1:{args.base_port + i}" for i in range(args.shards)]
+        coordinator = ShardedRetriever(urls, timeout_ms=args.timeout_ms)
+        started = time.perf_counter()
+        coordinator.rebuild(rows)
+        print(f"{len(rows)} chunks indexed on {args.shards} shards in {time.perf_counter() - started:.2f} s")
+
+        single = InMemoryRetriever()
+        single.rebuild(rows)
+
+        mismatches = 0
+        for keywords in queries:
+            expected = single.search(None, [(keywords, args.max_chunks)])[0][0]
+            actual, partial = coordinator.search(None, [(keywords, args.max_chunks)])
+            same = not partial and [c["chunk_id"] for c in expected] == [c["chunk_id"] for c in actual[0]] and all(
+                math.isclose(e["relevance_score"], a["relevance_score"], rel_tol=1e-9)
+                for e, a in zip(expected, actual[0])
+            )
+            mismatches += not same
+        print(f"results differing from a single index: {mismatches} of {len(queries)}")
+
+        timed("single", lambda k: single.search(None, [(k, args.max_chunks)]), queries)
+        timed("sharded", lambda k: coordinator.search(None, [(k, args.max_chunks)]), queries)
+
+        # A stalled shard costs at most the timeout and is reported as partial
+        os.kill(processes[0].pid, signal.SIGSTOP)
+        try:
+            started = time.perf_counter()
+            results, partial = coordinator.search(None, [(queries[0], args.max_chunks)])
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"with one shard stalled: {len(results[0])} chunks, partial={partial}, {elapsed:.0f} ms")
+        finally:
+            os.kill(processes[0].pid, signal.SIGCONT)
+
+        coordinator.close()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Labeled sample documents for the chunking benchmark.
+
+Each document type is generated from templates so the corpus can be scaled,
+and every question comes with the answer text that a useful chunk must
+contain in full. Answers are unique to one document, so a hit can only come
+from the section or function the question is about.
+"""
+import random
+from typing import Any, Dict, List, Tuple
+
+TOPICS = [
+    "billing", "exports", "permissions", "retention", "webhooks", "search",
+    "invoices", "backups", "alerts", "quotas", "sessions", "imports"
+]
+
+FILLER = [
+    "This behaviour has been stable since the first release and is covered by the service agreement.",
+    "Administrators can change it from the settings page without restarting any service.",
+    "Changes are written to the audit log together with the name of the person who made them.",
+    "Older clients keep working, although they do not show the new options in their menus.",
+    "Support can confirm the current value for an account when asked through the help desk.",
+    "The same rule applies to every workspace in the organization unless a workspace overrides it.",
+    "Limits are checked when a request arrives, not when it is queued for later processing.",
+    "Most teams never need to change the default, which suits small and medium workloads."
+]
+
+
+def _tag(index: int) -> str:
+    """A name that tokenizes as one distinctive word, unlike a bare number."""
+    return f"rev{index:03d}"
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(count))
+
+
+def make_markdown(rng: random.Random, index: int) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+    """A manual with one section per topic, each holding a unique fact."""
+    tag = _tag(index)
+    sections = [f"# Operations manual {tag}\n\n{_sentences(rng, 3)}\n"]
+    questions = []
+    for topic in rng.sample(TOPICS, 6):
+        value = rng.randint(10, 990)
+        answer = f"the {topic} limit for manual {tag} is {value} per hour"
+        sections.append(
+            f"\n## {topic.title()} in manual {tag}\n\n{_sentences(rng, 4)}\n\n"
+            f"- Note that {answer}.\n- {rng.choice(FILLER)}\n\n"
+            f"```\n{topic}_limit_{tag} = {value}\n```\n\n{_sentences(rng, 3)}\n"
+        )
+        questions.append((f"What is the {topic} limit for manual {tag}?", answer))
+    return {"document_type": "markdown", "content": "".join(sections)}, questions
+
+
+def make_code(rng: random.Random, index: int) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+    """A Python module with one function per topic, each returning a unique constant."""
+    tag = _tag(index)
+    parts = [f'"""Helpers for service {tag}."""\nimport logging\n\nlogger = logging.getLogger(__name__)\n']
+    questions = []
+    for topic in rng.sample(TOPICS, 6):
+        value = rng.randint(1000, 9999)
+        answer = f"return {topic}_code_{tag} + {value}"
+        body = "\n".join(
+            f"    step_{i} = {topic}_code_{tag} * {i}  # {rng.choice(FILLER).lower()}" for i in range(1, 6)
+        )
+        parts.append(
+            f"\n\ndef compute_{topic}_code_{tag}({topic}_code_{tag}):\n"
+            f'    """Compute the {topic} code for service {tag}."""\n'
+            f"{body}\n    logger.debug('computed {topic}')\n    {answer}\n"
+        )
+        questions.append((f"How does service {tag} compute the {topic} code?", answer))
+    return {"document_type": "code", "content": "".join(parts)}, questions
+
+
+def make_faq(rng: random.Random, index: int) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+    """Prose questions and answers, with the answer in the middle of a paragraph."""
+    tag = _tag(index)
+    paragraphs = []
+    questions = []
+    for topic in rng.sample(TOPICS, 6):
+        days = rng.randint(2, 365)
+        answer = f"{topic} records of team {tag} are kept for {days} days"
+        paragraphs.append(
+            f"How long are {topic} records of team {tag} kept? {_sentences(rng, 2)} "
+            f"In short, {answer}. {_sentences(rng, 3)}"
+        )
+        questions.append((f"How long are {topic} records of team {tag} kept?", answer))
+    return {"document_type": "faq", "content": "\n\n".join(paragraphs)}, questions
+
+
+def make_samples(documents_per_type: int, seed: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Build the labeled sample set.
+
+    Args:
+        documents_per_type (int): Number of documents of each type
+        seed (int): Random seed
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Documents
+        (document_id, document_type, content) and questions (query,
+        answer, document_id)
+    """
+    rng = random.Random(seed)
+    documents = []
+    questions = []
+    for index in range(documents_per_type):
+        for make in (make_markdown, make_code, make_faq):
+            document, pairs = make(rng, index)
+            document["document_id"] = len(documents) + 1
+            documents.append(document)
+            for query, answer in pairs:
+                questions.append({"query": query, "answer": answer, "document_id": document["document_id"]})
+    return documents, questions
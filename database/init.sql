@@ -24,19 +24,62 @@ BEGIN
 END
 GO
 
+-- ChunkContents table to store each distinct chunk body once
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'ChunkContents')
+BEGIN
+    CREATE TABLE ChunkContents (
+        content_id INT IDENTITY(1,1) PRIMARY KEY,
+        content_hash BINARY(32) NOT NULL, -- HASHBYTES('SHA2_256', content)
+        simhash BIGINT, -- 64-bit SimHash for near-duplicate detection
+        simhash_band0 INT,
+        simhash_band1 INT,
+        simhash_band2 INT,
+        simhash_band3 INT,
+        cluster_id INT, -- content_id of the near-duplicate cluster, NULL if its own
+        content NVARCHAR(MAX) NOT NULL,
+        created_at DATETIME DEFAULT GETDATE()
+    );
+END
+GO
+
 -- Chunks table to store text chunks for retrieval
 IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'Chunks')
 BEGIN
     CREATE TABLE Chunks (
         chunk_id INT IDENTITY(1,1) PRIMARY KEY,
         document_id INT FOREIGN KEY REFERENCES Documents(document_id),
-        content NVARCHAR(MAX) NOT NULL,
+        content_id INT NOT NULL FOREIGN KEY REFERENCES ChunkContents(content_id),
         chunk_order INT NOT NULL,
         created_at DATETIME DEFAULT GETDATE()
     );
 END
 GO
 
+-- Move chunk bodies of databases created before ChunkContents existed.
+-- Migrated bodies have no SimHash and only collapse on exact duplicates.
+IF COL_LENGTH('Chunks', 'content') IS NOT NULL
+BEGIN
+    EXEC('
+        INSERT INTO ChunkContents (content_hash, content)
+        SELECT HASHBYTES(''SHA2_256'', content), MIN(content)
+        FROM Chunks
+        GROUP BY HASHBYTES(''SHA2_256'', content);
+
+        ALTER TABLE Chunks ADD content_id INT NULL;
+    ');
+    EXEC('
+        UPDATE c SET content_id = cc.content_id
+        FROM Chunks c
+        JOIN ChunkContents cc ON cc.content_hash = HASHBYTES(''SHA2_256'', c.content);
+
+        ALTER TABLE Chunks ALTER COLUMN content_id INT NOT NULL;
+        ALTER TABLE Chunks ADD CONSTRAINT FK_Chunks_ChunkContents
+            FOREIGN KEY (content_id) REFERENCES ChunkContents(content_id);
+        ALTER TABLE Chunks DROP COLUMN content;
+    ');
+END
+GO
+
 -- Queries table to store user queries and responses
 IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'Queries')
 BEGIN
@@ -45,11 +88,18 @@ BEGIN
         query_text NVARCHAR(1000) NOT NULL,
         response_text NVARCHAR(MAX),
         created_at DATETIME DEFAULT GETDATE(),
-        metadata NVARCHAR(MAX) -- JSON field to store relevant chunks, etc.
+        metadata NVARCHAR(MAX), -- JSON field to store relevant chunks, etc.
+        session_id NVARCHAR(64) -- Conversation session, NULL for stateless queries
     );
 END
 GO
 
+IF COL_LENGTH('Queries', 'session_id') IS NULL
+BEGIN
+    ALTER TABLE Queries ADD session_id NVARCHAR(64);
+END
+GO
+
 -- Create indexes for better performance
 IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Chunks_DocumentId' AND object_id = OBJECT_ID('Chunks'))
 BEGIN
@@ -57,6 +107,43 @@ BEGIN
 END
 GO
 
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Queries_SessionId' AND object_id = OBJECT_ID('Queries'))
+BEGIN
+    CREATE INDEX IX_Queries_SessionId ON Queries (session_id, query_id) WHERE session_id IS NOT NULL;
+END
+GO
+
+-- Indexes backing the query metadata filters, so filtering happens before scoring
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Documents_DocumentType' AND object_id = OBJECT_ID('Documents'))
+BEGIN
+    CREATE INDEX IX_Documents_DocumentType ON Documents (document_type);
+    CREATE INDEX IX_Documents_Source ON Documents (source);
+    CREATE INDEX IX_Documents_CreatedAt ON Documents (created_at);
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Chunks_DocumentId_ContentId' AND object_id = OBJECT_ID('Chunks'))
+BEGIN
+    CREATE INDEX IX_Chunks_DocumentId_ContentId ON Chunks (document_id) INCLUDE (content_id, chunk_id);
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Chunks_ContentId' AND object_id = OBJECT_ID('Chunks'))
+BEGIN
+    CREATE INDEX IX_Chunks_ContentId ON Chunks (content_id, chunk_id);
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_ChunkContents_Hash' AND object_id = OBJECT_ID('ChunkContents'))
+BEGIN
+    CREATE UNIQUE INDEX UX_ChunkContents_Hash ON ChunkContents (content_hash);
+    CREATE INDEX IX_ChunkContents_Band0 ON ChunkContents (simhash_band0) INCLUDE (simhash, cluster_id);
+    CREATE INDEX IX_ChunkContents_Band1 ON ChunkContents (simhash_band1) INCLUDE (simhash, cluster_id);
+    CREATE INDEX IX_ChunkContents_Band2 ON ChunkContents (simhash_band2) INCLUDE (simhash, cluster_id);
+    CREATE INDEX IX_ChunkContents_Band3 ON ChunkContents (simhash_band3) INCLUDE (simhash, cluster_id);
+END
+GO
+
 
 -- Run additional setup scripts
 :r /usr/config/setup/create_tables.sql
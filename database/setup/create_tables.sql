@@ -10,24 +10,37 @@ BEGIN
     ('LangChain Documentation', 'LangChain is a framework for developing applications powered by language models. It provides tools and abstractions for working with LLMs, including RAG systems.', 'API Documentation', 'documentation'),
     ('MSSQL Integration Guide', 'This guide explains how to integrate Microsoft SQL Server with Python applications. Topics include connection management, query optimization, and containerization with Docker.', 'Technical Guide', 'guide');
 
+    -- Create chunk bodies, fingerprinted the same way as the application
+    -- (SimHash is left NULL; these bodies only collapse on exact duplicates)
+    INSERT INTO ChunkContents (content_hash, content)
+    SELECT HASHBYTES('SHA2_256', content), content
+    FROM (VALUES
+        (N'Retrieval-Augmented Generation (RAG) is an AI framework that combines retrieval-based and generation-based approaches.'),
+        (N'It enhances large language models by retrieving relevant information from external knowledge sources.'),
+        (N'LangChain is a framework for developing applications powered by language models.'),
+        (N'It provides tools and abstractions for working with LLMs, including RAG systems.'),
+        (N'This guide explains how to integrate Microsoft SQL Server with Python applications.'),
+        (N'Topics include connection management, query optimization, and containerization with Docker.')
+    ) AS bodies (content);
+
     -- Create chunks for each document
     -- Document 1 chunks
-    INSERT INTO Chunks (document_id, content, chunk_order)
+    INSERT INTO Chunks (document_id, content_id, chunk_order)
     VALUES 
-    (1, 'Retrieval-Augmented Generation (RAG) is an AI framework that combines retrieval-based and generation-based approaches.', 1),
-    (1, 'It enhances large language models by retrieving relevant information from external knowledge sources.', 2);
+    (1, 1, 1),
+    (1, 2, 2);
 
     -- Document 2 chunks
-    INSERT INTO Chunks (document_id, content, chunk_order)
+    INSERT INTO Chunks (document_id, content_id, chunk_order)
     VALUES 
-    (2, 'LangChain is a framework for developing applications powered by language models.', 1),
-    (2, 'It provides tools and abstractions for working with LLMs, including RAG systems.', 2);
+    (2, 3, 1),
+    (2, 4, 2);
 
     -- Document 3 chunks
-    INSERT INTO Chunks (document_id, content, chunk_order)
+    INSERT INTO Chunks (document_id, content_id, chunk_order)
     VALUES 
-    (3, 'This guide explains how to integrate Microsoft SQL Server with Python applications.', 1),
-    (3, 'Topics include connection management, query optimization, and containerization with Docker.', 2);
+    (3, 5, 1),
+    (3, 6, 2);
 
     PRINT 'Sample data inserted successfully.';
 END